@@ -0,0 +1,63 @@
+"""Throughput of the async payout/refund routes while upstream calls are slow.
+
+Fires concurrent /payout/check-status requests at the app against a local
+stub that delays every reply, and times a /-request issued while they are in
+flight. With blocking upstream calls the wall time grows with the request
+count and the probe waits behind them; with the async transport both stay
+close to a single upstream delay.
+
+Run from python_backend/:  python -m benchmarks.bench_async_transport
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("XENDIT_SECRET_KEY", "bench-key")
+
+from benchmarks.stub_upstream import StubUpstream
+from main import app
+from services.registry import ServiceRegistry
+
+
+async def main(concurrency: int = 50, delay: float = 0.2):
+    with StubUpstream(delay=delay) as stub:
+        os.environ["XENDIT_BASE_URL"] = stub.url
+        app.state.services = ServiceRegistry()
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            async def probe():
+                await asyncio.sleep(delay / 4)
+                start = time.perf_counter()
+                await client.get("/")
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            responses, probe_latency = await asyncio.gather(
+                asyncio.gather(
+                    *(
+                        client.get(f"/api/v1/payout/check-status/p-{i}")
+                        for i in range(concurrency)
+                    )
+                ),
+                probe(),
+            )
+            wall = time.perf_counter() - start
+
+        await app.state.services.aclose()
+
+    ok = sum(1 for r in responses if r.status_code == 200)
+    print(f"upstream delay        {delay * 1000:.0f} ms")
+    print(f"requests              {concurrency} ({ok} ok)")
+    print(f"wall time             {wall * 1000:.1f} ms")
+    print(f"serialized baseline   {concurrency * delay * 1000:.1f} ms")
+    print(f"throughput            {concurrency / wall:.1f} req/s")
+    print(f"probe latency         {probe_latency * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(a) for a in sys.argv[1:2])))
@@ -0,0 +1,70 @@
+"""Scaling benchmark for the auto-cancel sweeps on synthetic data.
+
+Loads N synthetic events (plus contracts, transactions, deliveries and
+applications) into an in-memory Firestore, or into the local emulator when
+FIRESTORE_EMULATOR_HOST is set, and reports wall time, reads, writes, RPCs
+and peak Python memory for auto_cancel_contracts and
+auto_delete_expired_events.
+
+Run from python_backend/:  python -m benchmarks.bench_auto_cancel 10000 100000 1000000
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fake_firestore import FakeFirestore
+from benchmarks.synthetic_data import load_synthetic
+from services.auto_cancel_service import AutoCancelService, build_firestore_client
+
+
+def _measure(service, sweep, **kwargs):
+    db = service.db
+    if hasattr(db, "reset_counters"):
+        db.reset_counters()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = getattr(service, sweep)(**kwargs)
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "wall": wall,
+        "reads": getattr(db, "reads", stats["reads"]),
+        "writes": getattr(db, "writes", stats["writes"]),
+        "rpcs": getattr(db, "rpcs", None),
+        "peak_mb": peak / 1e6,
+        "acted": stats["acted"],
+    }
+
+
+def main(sizes):
+    emulator = bool(os.getenv("FIRESTORE_EMULATOR_HOST"))
+    print(f"backend: {'emulator' if emulator else 'in-memory fake'}")
+    print(
+        f"{'events':>9} {'sweep':<28} {'wall s':>8} {'reads':>9} {'writes':>8} "
+        f"{'rpcs':>7} {'peak MB':>8} {'acted':>7}"
+    )
+
+    for size in sizes:
+        db = build_firestore_client() if emulator else FakeFirestore()
+        load_synthetic(db, size)
+        service = AutoCancelService(db=db)
+
+        for sweep in ("auto_cancel_contracts", "auto_delete_expired_events"):
+            row = _measure(service, sweep)
+            rpcs = "-" if row["rpcs"] is None else row["rpcs"]
+            print(
+                f"{size:>9} {sweep:<28} {row['wall']:>8.2f} {row['reads']:>9} "
+                f"{row['writes']:>8} {rpcs:>7} {row['peak_mb']:>8.1f} {row['acted']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10000, 100000])
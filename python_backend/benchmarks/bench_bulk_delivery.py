@@ -0,0 +1,95 @@
+"""Booking many Lalamove orders one by one vs. through /delivery/bulk.
+
+The stub delays every reply and answers one request with 429 and a
+Retry-After, as Lalamove does when the account's rate limit is hit. The
+sequential run mirrors the frontend posting one /delivery per order; the
+bulk run books them concurrently under the token-bucket limiter.
+
+The last run books a batch at 5 orders/s that takes longer than the whole
+REQUEST_DEADLINE; every order has its own budget, so none may fail. The
+run fails with AssertionError if any order is not booked.
+
+Run from python_backend/:  python -m benchmarks.bench_bulk_delivery [orders]
+"""
+
+import asyncio
+import itertools
+import os
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("LALAMOVE_API_KEY", "bench-key")
+os.environ.setdefault("LALAMOVE_SECRET", "bench-secret")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+os.environ.setdefault("REQUEST_DEADLINE", "3")
+
+from benchmarks.stub_upstream import StubUpstream
+from main import app
+from services.registry import ServiceRegistry
+
+RATE_LIMITED_REQUEST = 20
+_requests = itertools.count(1)
+
+
+def lalamove_responder(method, path, body):
+    number = next(_requests)
+    if number == RATE_LIMITED_REQUEST:
+        return 429, {"message": "TOO_MANY_REQUESTS"}, {"Retry-After": "1"}
+    return 201, {"data": {"orderId": f"order-{number}", "status": "ASSIGNING_DRIVER"}}
+
+
+def delivery(i):
+    return {
+        "serviceType": "MOTORCYCLE",
+        "stops": [
+            {"address": f"Supplier {i}", "lat": 14.55 + i / 1000, "lng": 121.02},
+            {"address": "Venue", "lat": 14.60, "lng": 121.05},
+        ],
+    }
+
+
+async def run(orders: int, bulk: bool, rate: str = "50", burst: str = "10"):
+    with StubUpstream(delay=0.1, responder=lalamove_responder) as stub:
+        os.environ["LALAMOVE_BASE_URL"] = stub.url
+        os.environ["LALAMOVE_RATE_LIMIT"] = rate
+        os.environ["LALAMOVE_RATE_BURST"] = burst
+        app.state.services = ServiceRegistry()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://app", timeout=60
+        ) as client:
+            start = time.perf_counter()
+            if bulk:
+                response = await client.post(
+                    "/api/v1/delivery/bulk",
+                    json={"deliveries": [delivery(i) for i in range(orders)]},
+                )
+                booked = response.json()["succeeded"]
+            else:
+                booked = 0
+                for i in range(orders):
+                    response = await client.post("/api/v1/delivery", json=delivery(i))
+                    booked += response.status_code == 200
+            wall = time.perf_counter() - start
+        await app.state.services.aclose()
+    return wall, booked
+
+
+async def main(orders: int = 50):
+    print(f"{'mode':<12} {'orders':>7} {'booked':>7} {'wall s':>8} {'orders/s':>9}")
+    runs = (
+        ("sequential", orders, (False,)),
+        ("bulk", orders, (True,)),
+        # 30 orders at 5/s take about 6 s, twice the request deadline.
+        ("bulk, 5/s", 30, (True, "5", "5")),
+    )
+    for mode, count, args in runs:
+        wall, booked = await run(count, *args)
+        print(f"{mode:<12} {count:>7} {booked:>7} {wall:>8.2f} {count / wall:>9.1f}")
+        assert booked == count, f"{mode}: booked {booked} of {count}"
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(a) for a in sys.argv[1:2])))
@@ -0,0 +1,83 @@
+"""Cache hit rate and latency across workers, per cache backend.
+
+Forks ``WORKERS`` processes standing in for uvicorn workers. Each looks up
+keys drawn from a skewed distribution over a shared key space, storing the
+value on a miss, the way ``GeminiService`` caches recommendations. With the
+in-process backend every worker warms its own copy; with SQLite or Redis a
+value stored by one worker is a hit for all of them.
+
+The Redis row runs against ``benchmarks.stub_redis`` unless ``REDIS_URL``
+points at a real server.
+
+Run from python_backend/:  python -m benchmarks.bench_cache_backends
+"""
+
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.stub_redis import StubRedis
+from services.cache import build_cache
+
+WORKERS = 4
+KEYS = 2000
+
+
+def _worker(url: str, lookups: int, seed: int, results):
+    os.environ["CACHE_BACKEND_URL"] = url
+    cache = build_cache("bench", maxsize=KEYS, ttl=600)
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(lookups):
+        key = f"prompt-{int(KEYS * rng.random() ** 2)}"
+        start = time.perf_counter()
+        if cache.get(key) is None:
+            cache.set(key, {"recommendations": key * 8})
+        samples.append((time.perf_counter() - start) * 1000)
+    results.put((cache.hits, cache.misses, samples))
+
+
+def run(url: str, lookups: int):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [
+        context.Process(target=_worker, args=(url, lookups, seed, results))
+        for seed in range(WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    collected = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    hits = sum(h for h, _, _ in collected)
+    misses = sum(m for _, m, _ in collected)
+    samples = [s for _, _, worker_samples in collected for s in worker_samples]
+    return (
+        hits / (hits + misses),
+        misses,
+        statistics.median(samples),
+        statistics.quantiles(samples, n=100)[98],
+    )
+
+
+def main(lookups: int = 5000):
+    with tempfile.TemporaryDirectory() as tmp, StubRedis() as stub:
+        backends = [
+            ("memory", "memory://"),
+            ("sqlite", f"sqlite:///{tmp}/cache.db"),
+            ("redis", os.getenv("REDIS_URL", stub.url)),
+        ]
+        print(f"{WORKERS} workers x {lookups} lookups over {KEYS} keys")
+        print(f"{'backend':<8} {'hit rate':>9} {'misses':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, url in backends:
+            hit_rate, misses, p50, p99 = run(url, lookups)
+            print(f"{name:<8} {hit_rate:>9.1%} {misses:>8} {p50:>8.3f} {p99:>8.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
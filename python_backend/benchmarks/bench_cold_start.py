@@ -0,0 +1,113 @@
+"""Cold start: ``import main`` time and time-to-first-response per route.
+
+Every case runs in a fresh interpreter so nothing is already imported. The
+first request to a route pays for building its service, including the SDK
+import; ``WARMUP_SERVICES`` moves that cost to startup, in the background.
+
+Xendit calls go to a local stub; the Gemini row times building the service
+only, so no API key or network is needed.
+
+Run from python_backend/:  python -m benchmarks.bench_cold_start
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.stub_upstream import StubUpstream
+
+CHILD = r"""
+import json, sys, time
+
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+
+case = json.loads(sys.argv[1])
+with TestClient(main.app) as client:
+    warmup = getattr(main.app.state, "warmup", None)
+    if warmup is not None:
+        async def wait_for_warmup():
+            await warmup
+        client.portal.call(wait_for_warmup)
+    ready = time.perf_counter()
+    if case["method"] == "SERVICE":
+        getattr(main.app.state.services, case["path"])
+        status = 200
+    else:
+        response = client.request(
+            case["method"], case["path"], json=case.get("json"), headers=case.get("headers")
+        )
+        status = response.status_code
+    done = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_ms": (done - ready) * 1000,
+    "status": status,
+}))
+"""
+
+CASES = [
+    ("GET /", {"method": "GET", "path": "/"}),
+    ("GET /metrics", {"method": "GET", "path": "/metrics"}),
+    (
+        "POST /payment/webhook",
+        {
+            "method": "POST",
+            "path": "/api/v1/payment/webhook",
+            "json": {"id": "inv-1", "status": "PAID"},
+            "headers": {"x-callback-token": "bench-token"},
+        },
+    ),
+    (
+        "GET /payout/check-status",
+        {"method": "GET", "path": "/api/v1/payout/check-status/payout-1"},
+    ),
+    ("gemini service build", {"method": "SERVICE", "path": "gemini"}),
+]
+
+
+def run_case(case: dict, env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD, json.dumps(case)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(repeat: int = 3):
+    with StubUpstream() as stub:
+        env = {
+            **os.environ,
+            "XENDIT_SECRET_KEY": "bench-key",
+            "XENDIT_CALLBACK_TOKEN": "bench-token",
+            "XENDIT_BASE_URL": stub.url,
+            "GEMINI_API_KEY": "bench-key",
+            "LOG_LEVEL": "WARNING",
+        }
+        scenarios = [
+            ("lazy", {}),
+            ("warm-up", {"WARMUP_SERVICES": "payment,payout,gemini"}),
+        ]
+
+        print(f"{'case':<28} {'mode':<8} {'import ms':>10} {'first ms':>10} {'status':>7}")
+        for name, case in CASES:
+            for mode, extra in scenarios:
+                runs = [run_case(case, {**env, **extra}) for _ in range(repeat)]
+                import_ms = sorted(r["import_ms"] for r in runs)[repeat // 2]
+                first_ms = sorted(r["first_ms"] for r in runs)[repeat // 2]
+                print(
+                    f"{name:<28} {mode:<8} {import_ms:>10.1f} {first_ms:>10.1f} "
+                    f"{runs[0]['status']:>7}"
+                )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
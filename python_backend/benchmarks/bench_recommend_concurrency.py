@@ -0,0 +1,101 @@
+"""Concurrent /recommend throughput per worker, blocking vs. async Gemini calls.
+
+The Gemini model is replaced by a stub that takes a fixed time to answer.
+"blocking" reproduces the old behaviour (a synchronous generate_content call
+inside the async handler); "async" is the current awaitable call with
+single-flight coalescing. Each mode is run with distinct prompts and with
+one prompt sent by every client.
+
+Run from python_backend/:  python -m benchmarks.bench_recommend_concurrency [clients] [delay_ms]
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+
+from main import app
+from services.gemini_service import GeminiService
+from services.registry import ServiceRegistry
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class BlockingGeminiService(GeminiService):
+    """The pre-async service: blocks the event loop for the whole generation."""
+
+    async def get_recommendations(self, user_prompt, suppliers, cache_scope=None):
+        time.sleep(self.delay)
+        return "1: A – blocking"
+
+
+def _stub_model(service, delay, counter):
+    async def generate_content_async(prompt, **kwargs):
+        counter["calls"] += 1
+        await asyncio.sleep(delay)
+        return _Response("1: A – async")
+
+    service.model.generate_content_async = generate_content_async
+
+
+async def _run(service, clients, same_prompt):
+    app.state.services = ServiceRegistry()
+    app.state.services._services["gemini"] = service
+
+    supplier = {"name": "A", "category": "Catering", "avg_rating": 4.5, "reviews": "great"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=None) as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *(
+                client.post(
+                    "/api/v1/recommend",
+                    json={
+                        "user_prompt": "catering" if same_prompt else f"catering {i}",
+                        "suppliers": [supplier],
+                    },
+                )
+                for i in range(clients)
+            )
+        )
+        wall = time.perf_counter() - start
+
+    await app.state.services.aclose()
+    assert all(r.status_code == 200 for r in responses)
+    return wall
+
+
+async def main(clients: int = 50, delay_ms: int = 300):
+    delay = delay_ms / 1000
+    print(f"{'mode':<10} {'prompts':<10} {'wall s':>8} {'req/s':>8} {'upstream calls':>15}")
+
+    for mode in ("blocking", "async"):
+        for same_prompt in (False, True):
+            counter = {"calls": 0}
+            if mode == "blocking":
+                service = BlockingGeminiService()
+                service.delay = delay
+                counter["calls"] = clients
+            else:
+                service = GeminiService()
+                _stub_model(service, delay, counter)
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                wall = await _run(service, clients, same_prompt)
+            label = "same" if same_prompt else "distinct"
+            print(
+                f"{mode:<10} {label:<10} {wall:>8.2f} {clients / wall:>8.1f} {counter['calls']:>15}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(a) for a in sys.argv[1:3])))
@@ -0,0 +1,67 @@
+"""Per-request cost of building services vs. reusing them from the registry.
+
+The payout rows time the Xendit status fetch itself: ``check_status`` is
+answered from the reconciler's store after the first call, which would
+hide the connection reuse being measured.
+
+Run from python_backend/:  python -m benchmarks.bench_service_registry
+"""
+
+import asyncio
+import inspect
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("XENDIT_SECRET_KEY", "bench-key")
+os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+
+from benchmarks.stub_upstream import StubUpstream
+from services.gemini_service import GeminiService
+from services.payout_service import PayoutService
+from services.registry import ServiceRegistry
+
+
+async def _timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn()
+        if inspect.isawaitable(result):
+            await result
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), statistics.quantiles(samples, n=100)[98]
+
+
+async def main(iterations: int = 500):
+    with StubUpstream() as stub:
+        os.environ["XENDIT_BASE_URL"] = stub.url
+        registry = ServiceRegistry()
+
+        async def per_request_payout():
+            service = PayoutService()
+            try:
+                await service._fetch_status("payout-1")
+            finally:
+                await service.http.aclose()
+                service.close()
+
+        async def shared_payout():
+            await registry.payout._fetch_status("payout-1")
+
+        rows = [
+            ("payout status fetch, new service", await _timed(per_request_payout, iterations)),
+            ("payout status fetch, registry", await _timed(shared_payout, iterations)),
+            ("gemini service, new service", await _timed(GeminiService, iterations)),
+            ("gemini service, registry", await _timed(lambda: registry.gemini, iterations)),
+        ]
+        await registry.aclose()
+
+    print(f"{'case':<36} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, (p50, p99) in rows:
+        print(f"{name:<36} {p50:>10.3f} {p99:>10.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
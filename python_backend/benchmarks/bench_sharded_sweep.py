@@ -0,0 +1,118 @@
+"""Sharded auto-cancel sweep across worker threads, with failing workers.
+
+Each worker runs ShardedSweep against a shared in-memory Firestore. The first
+worker dies in the middle of its first shard, after that shard's contract
+cancellations are committed. The second stalls before its first commit until
+its lease has expired and another worker has taken its shard over. The
+others must finish both shards, and every expired contract must be
+cancelled (and notified) exactly once. The run fails with AssertionError
+otherwise.
+
+Run from python_backend/:  python -m benchmarks.bench_sharded_sweep [events] [workers] [shards]
+"""
+
+import contextlib
+import io
+import sys
+import threading
+import time
+from collections import Counter
+
+from benchmarks.fake_firestore import FakeFirestore
+from benchmarks.synthetic_data import load_synthetic
+from services.auto_cancel_service import AutoCancelService
+from services.shard_lease import ShardedSweep, ShardLeases
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+class CrashingService(AutoCancelService):
+    def auto_delete_expired_events(self, *args, **kwargs):
+        raise WorkerCrashed("worker died mid-shard")
+
+
+class StallingService(AutoCancelService):
+    """Pauses once, after scanning and before committing, until ``owner``
+    holds no lease any more, i.e. another worker has taken its shard over."""
+
+    def __init__(self, db, owner):
+        super().__init__(db)
+        self.owner = owner
+        self.stalled = False
+
+    def _get_events(self, event_ids):
+        events = super()._get_events(event_ids)
+        if not self.stalled:
+            self.stalled = True
+            deadline = time.monotonic() + 30
+            while time.monotonic() < deadline and any(
+                lease["owner"] == self.owner and lease["status"] == "leased"
+                for lease in self.db.documents("sweep_leases").values()
+            ):
+                time.sleep(0.05)
+        return events
+
+
+def main(events: int = 20000, workers: int = 4, shards: int = 16, lease_ttl: float = 1.0):
+    db = FakeFirestore()
+    expected = load_synthetic(db, events)
+    outcomes = {}
+
+    def worker(name, service):
+        leases = ShardLeases(db, owner=name, ttl=lease_ttl)
+        sweep = ShardedSweep(service, leases, shards, poll_interval=0.1)
+        try:
+            outcomes[name] = sweep.run("bench-run", timeout=60)
+        except WorkerCrashed as e:
+            outcomes[name] = {"crashed": str(e)}
+
+    threads = [
+        threading.Thread(target=worker, args=("worker-0", CrashingService(db))),
+        threading.Thread(target=worker, args=("worker-1", StallingService(db, "worker-1"))),
+    ]
+    threads += [
+        threading.Thread(target=worker, args=(f"worker-{i}", AutoCancelService(db)))
+        for i in range(2, workers)
+    ]
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - start
+
+    contracts = db.documents("contracts")
+    cancelled = sum(1 for c in contracts.values() if c["status"] == "Cancelled")
+    notified = Counter(n["referenced_id"] for n in db.documents("notifications").values() if "referenced_id" in n)
+    # Each cancellation notifies the supplier and the planner once.
+    duplicates = sum(count - 2 for count in notified.values() if count > 2)
+    leases = db.documents("sweep_leases")
+
+    print(f"events / shards / workers    {events} / {shards} / {workers}")
+    print(f"wall time                    {wall:.2f} s")
+    for name in sorted(outcomes):
+        outcome = outcomes[name]
+        if "crashed" in outcome:
+            print(f"  {name:<26} crashed")
+        else:
+            print(
+                f"  {name:<26} {outcome['shards_swept']} shards, "
+                f"{outcome['shards_lost']} lost"
+            )
+    done = sum(1 for l in leases.values() if l["status"] == "done")
+    print(f"shards done                  {done}/{shards}")
+    print(f"contracts cancelled          {cancelled} (expected {expected})")
+    print(f"duplicate notifications      {duplicates}")
+
+    assert done == shards, f"only {done}/{shards} shards done"
+    assert cancelled == expected, f"cancelled {cancelled}, expected {expected}"
+    assert duplicates == 0, f"{duplicates} duplicate notifications"
+    assert outcomes["worker-1"].get("shards_lost") == 1, "stalled worker kept its lease"
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:4]))
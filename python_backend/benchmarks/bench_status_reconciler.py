@@ -0,0 +1,111 @@
+"""Upstream status calls: client-driven polling vs. the background reconciler.
+
+Creates pending payouts, then has every client poll
+/payout/check-status/{id} in a loop until it sees a terminal status. The
+fake Xendit marks a payout SUCCEEDED a fixed time after creation and counts
+its status calls. Without the reconciler every client poll is one upstream
+call; with it, upstream calls follow the number of pending payouts.
+
+Run from python_backend/:  python -m benchmarks.bench_status_reconciler
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("XENDIT_SECRET_KEY", "bench-key")
+os.environ.setdefault("RECONCILE_BASE_DELAY", "0.2")
+os.environ.setdefault("RECONCILE_INTERVAL", "0.05")
+
+from main import app
+from services.registry import ServiceRegistry
+
+SETTLE_AFTER = 1.5
+CLIENT_POLL_INTERVAL = 0.1
+
+
+class FakeXendit:
+    def __init__(self):
+        self.created = {}
+        self.status_calls = 0
+
+    async def __call__(self, request):
+        if request.method == "POST":
+            reference_id = json.loads(request.content)["reference_id"]
+            payout_id = f"disb-{reference_id}"
+            self.created[payout_id] = time.monotonic()
+            return httpx.Response(200, json={"id": payout_id, "status": "ACCEPTED"})
+
+        self.status_calls += 1
+        payout_id = request.url.path.rsplit("/", 1)[-1]
+        settled = time.monotonic() - self.created[payout_id] >= SETTLE_AFTER
+        return httpx.Response(
+            200, json={"id": payout_id, "status": "SUCCEEDED" if settled else "ACCEPTED"}
+        )
+
+
+async def run(payouts: int, clients_per_payout: int, reconcile: bool):
+    xendit = FakeXendit()
+    app.state.services = ServiceRegistry()
+    service = app.state.services.payout
+    service.http = httpx.AsyncClient(transport=httpx.MockTransport(xendit))
+    # Runs reuse reference ids; don't replay payouts from a persistent cache.
+    service.idempotency_store.clear()
+    if not reconcile:
+        # Baseline: every read goes to Xendit, as before the reconciler.
+        service.check_status = service._fetch_status
+        async def untracked(*args):
+            pass
+
+        service.reconciler.track = untracked
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+        for i in range(payouts):
+            await client.post(
+                "/api/v1/payout",
+                json={
+                    "reference_id": f"r{i}",
+                    "channel_code": "PH_BDO",
+                    "account_holder_name": "Supplier",
+                    "account_number": "0001",
+                    "amount": 1000,
+                },
+            )
+
+        async def poll(payout_id):
+            polls = 0
+            while True:
+                polls += 1
+                response = await client.get(f"/api/v1/payout/check-status/{payout_id}")
+                if response.json()["status"] == "SUCCEEDED":
+                    return polls
+                await asyncio.sleep(CLIENT_POLL_INTERVAL)
+
+        start = time.perf_counter()
+        polls = await asyncio.gather(
+            *(
+                poll(f"disb-r{i}")
+                for i in range(payouts)
+                for _ in range(clients_per_payout)
+            )
+        )
+        wall = time.perf_counter() - start
+
+    await app.state.services.aclose()
+    return sum(polls), xendit.status_calls, wall
+
+
+async def main(payouts: int = 50, clients_per_payout: int = 3):
+    print(f"{'mode':<12} {'client polls':>13} {'upstream calls':>15} {'wall s':>8}")
+    for mode, reconcile in (("live", False), ("reconciler", True)):
+        polls, calls, wall = await run(payouts, clients_per_payout, reconcile)
+        print(f"{mode:<12} {polls:>13} {calls:>15} {wall:>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(a) for a in sys.argv[1:3])))
@@ -0,0 +1,66 @@
+"""Prompt size and build latency with and without local supplier pre-ranking.
+
+Generates synthetic catalogs of 10 to 5,000 suppliers and compares the prompt
+GeminiService builds when every supplier is sent against the top-K prompt.
+Token counts are estimated at four characters per token.
+
+Run from python_backend/:  python -m benchmarks.bench_supplier_ranking [top_k]
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+
+from models.schemas import Supplier
+from services.gemini_service import GeminiService
+
+CATEGORIES = ["Catering", "Photography", "Lights and Sound", "Florist", "Venue", "Decor", "Transport"]
+WORDS = (
+    "great food friendly staff on time delicious buffet wedding birthday corporate "
+    "beautiful flowers amazing photos late setup loud music elegant venue cheap "
+    "professional responsive creative budget premium halal vegan desserts drinks"
+).split()
+
+PROMPT = "Looking for a halal catering service with delicious desserts for a wedding"
+
+
+def make_suppliers(count: int, rng: random.Random):
+    return [
+        Supplier(
+            name=f"Supplier {i}",
+            category=rng.choice(CATEGORIES),
+            avg_rating=round(rng.uniform(0, 5), 1),
+            reviews=" ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 120))),
+        )
+        for i in range(count)
+    ]
+
+
+def _median_ms(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def main(top_k: int = 10):
+    rng = random.Random(3)
+    service = GeminiService()
+
+    print(f"{'suppliers':>9} {'mode':<10} {'prompt chars':>13} {'~tokens':>9} {'build ms':>9}")
+    for count in (10, 100, 1000, 5000):
+        suppliers = make_suppliers(count, rng)
+        for mode, k in (("all", count), (f"top-{top_k}", top_k)):
+            service.top_k = k
+            ms, prompt = _median_ms(lambda: service.build_prompt(PROMPT, suppliers))
+            print(f"{count:>9} {mode:<10} {len(prompt):>13} {len(prompt) // 4:>9} {ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
@@ -0,0 +1,93 @@
+"""Upstream resilience against a fault-injecting stub.
+
+The stub's behaviour is picked by the first path segment of the base URL:
+
+- ``/flaky``  every third request answers 503
+- ``/hang``   every request stalls for 3 s
+
+Scenarios call ``PayoutService.check_status`` (idempotent, so retried) and
+report successes, failures and latency:
+
+- flaky upstream with and without retries
+- hung upstream: calls time out until the breaker opens, then fail fast
+- hung upstream under a 1 s request deadline with a generous timeout
+
+Run from python_backend/:  python -m benchmarks.bench_upstream_faults
+"""
+
+import asyncio
+import itertools
+import os
+import statistics
+import time
+
+import httpx
+
+os.environ.setdefault("XENDIT_SECRET_KEY", "bench-key")
+
+from benchmarks.stub_upstream import StubUpstream
+from services.payout_service import PayoutService
+from services.upstream import Upstream, deadline_scope
+
+_requests = itertools.count(1)
+
+
+def fault_responder(method, path, body):
+    mode = path.split("/")[1]
+    if mode == "flaky" and next(_requests) % 3 == 0:
+        return 503, {"error_code": "SERVER_ERROR"}
+    if mode == "hang":
+        time.sleep(3)
+    return 200, {"id": path.rsplit("/", 1)[-1], "status": "SUCCEEDED"}
+
+
+async def scenario(stub, mode, calls, deadline=None, **policy):
+    service = PayoutService(client=httpx.AsyncClient(), upstream=Upstream("xendit", **policy))
+    service.base_url = f"{stub.url}/{mode}"
+    ok, errors, latencies = 0, {}, []
+
+    for i in range(calls):
+        start = time.perf_counter()
+        try:
+            if deadline is None:
+                payout = await service.check_status(f"p-{i}")
+            else:
+                with deadline_scope(deadline):
+                    payout = await service.check_status(f"p-{i}")
+            if payout.get("status") == "SUCCEEDED":
+                ok += 1
+            else:
+                errors["HTTP 503"] = errors.get("HTTP 503", 0) + 1
+        except Exception as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+        latencies.append(time.perf_counter() - start)
+
+    await service.http.aclose()
+    return ok, errors, latencies, service.upstream.breaker.state
+
+
+def report(name, result):
+    ok, errors, latencies, state = result
+    p50 = statistics.median(latencies) * 1000
+    worst = max(latencies) * 1000
+    failures = ", ".join(f"{n}={c}" for n, c in sorted(errors.items())) or "-"
+    print(f"{name:<28} {ok:>4} {p50:>9.1f} {worst:>9.1f}  {state:<10} {failures}")
+
+
+async def main():
+    print(f"{'scenario':<28} {'ok':>4} {'p50 ms':>9} {'max ms':>9}  {'breaker':<10} failures")
+    with StubUpstream(responder=fault_responder) as stub:
+        report("flaky, no retries", await scenario(stub, "flaky", 30, retries=0, failure_threshold=100))
+        report("flaky, 2 retries", await scenario(stub, "flaky", 30, retries=2, failure_threshold=100))
+        report(
+            "hung, 0.5 s timeout",
+            await scenario(stub, "hang", 20, timeout=0.5, retries=1, failure_threshold=3),
+        )
+        report(
+            "hung, 1 s deadline",
+            await scenario(stub, "hang", 5, deadline=1.0, timeout=10, failure_threshold=100),
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
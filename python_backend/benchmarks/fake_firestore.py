@@ -0,0 +1,550 @@
+"""In-memory stand-in for ``google.cloud.firestore.Client``.
+
+Implements the subset of the client API the backend uses (collections,
+documents, filtered/ordered queries with cursors, ``get_all``, batched writes
+and last-update-time preconditions) and counts reads, writes and RPCs the way
+Firestore bills them.
+"""
+
+import copy
+import enum
+import itertools
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from google.api_core import exceptions
+from google.cloud import firestore
+
+DOCUMENT_ID = "__name__"
+_id_counter = itertools.count()
+
+
+def _lookup(data, path):
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            raise KeyError(path)
+        value = value[part]
+    return value
+
+
+def _clone(value):
+    # Documents only nest dicts and lists; leaf values are immutable.
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+
+def _resolve(value, now):
+    if value is firestore.SERVER_TIMESTAMP:
+        return now
+    if isinstance(value, dict):
+        return {k: _resolve(v, now) for k, v in value.items()}
+    return value
+
+
+def _matches(value, op, expected):
+    try:
+        if op == "==":
+            return value == expected
+        if op == "!=":
+            return value != expected
+        if op == "<":
+            return value < expected
+        if op == "<=":
+            return value <= expected
+        if op == ">":
+            return value > expected
+        if op == ">=":
+            return value >= expected
+        if op == "in":
+            return value in expected
+        if op == "not-in":
+            return value not in expected
+        if op == "array-contains":
+            return expected in value
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported operator: {op}")
+
+
+class FakeLastUpdateOption:
+    def __init__(self, last_update_time):
+        self.last_update_time = last_update_time
+
+
+class FakeWriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data, update_time):
+        self.reference = reference
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return _clone(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        if field_path == DOCUMENT_ID:
+            return self.id
+        return _clone(_lookup(self._data, field_path))
+
+
+class FakeDocumentReference:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    def get(self, field_paths=None, transaction=None):
+        client = self._client
+        with client._lock:
+            client.rpcs += 1
+            client.reads += 1
+            return self._snapshot()
+
+    def _snapshot(self):
+        stored = self._client._collections[self._collection].get(self.id)
+        if stored is None:
+            return FakeSnapshot(self, None, None)
+        data, update_time = stored
+        return FakeSnapshot(self, data, update_time)
+
+    def set(self, document_data, merge=False):
+        return self._client._commit([("set", self, document_data, merge)])[0]
+
+    def create(self, document_data):
+        return self._client._commit([("create", self, document_data, None)])[0]
+
+    def update(self, field_updates, option=None):
+        return self._client._commit([("update", self, field_updates, option)])[0]
+
+    def delete(self, option=None):
+        return self._client._commit([("delete", self, None, option)])[0]
+
+
+class FakeQuery:
+    def __init__(self, client, collection):
+        self._client = client
+        self._collection = collection
+        self._filters = []
+        self._orders = []
+        self._limit = None
+        self._start = None
+        self._end = None
+        self._projection = None
+
+    def _copy(self, **changes):
+        query = copy.copy(self)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        for name, value in changes.items():
+            setattr(query, name, value)
+        return query
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        query = self._copy()
+        query._filters.append((field_path, op_string, value))
+        return query
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        query = self._copy()
+        query._orders.append((field_path, direction == "DESCENDING"))
+        return query
+
+    def limit(self, count):
+        return self._copy(_limit=count)
+
+    def select(self, field_paths):
+        return self._copy(_projection=list(field_paths))
+
+    def _cursor(self, values, inclusive):
+        if isinstance(values, FakeSnapshot):
+            values = {
+                field: values.get(field) for field, _ in self._effective_orders()
+            }
+        if isinstance(values, dict):
+            values = [values[field] for field, _ in self._effective_orders() if field in values]
+        return (list(values), inclusive)
+
+    def start_at(self, values):
+        return self._copy(_start=self._cursor(values, True))
+
+    def start_after(self, values):
+        return self._copy(_start=self._cursor(values, False))
+
+    def end_at(self, values):
+        return self._copy(_end=self._cursor(values, True))
+
+    def end_before(self, values):
+        return self._copy(_end=self._cursor(values, False))
+
+    def _effective_orders(self):
+        orders = list(self._orders)
+        if not orders:
+            inequality = [
+                field for field, op, _ in self._filters
+                if op in ("<", "<=", ">", ">=", "!=", "not-in")
+            ]
+            orders = [(field, False) for field in dict.fromkeys(inequality)]
+        if DOCUMENT_ID not in [field for field, _ in orders]:
+            orders.append((DOCUMENT_ID, orders[-1][1] if orders else False))
+        return orders
+
+    @staticmethod
+    def _field(doc_id, data, field):
+        return doc_id if field == DOCUMENT_ID else _lookup(data, field)
+
+    def _candidates(self):
+        """Narrow the scan with an equality index when the query allows it."""
+        store = self._client._collections[self._collection]
+        for field, op, value in self._filters:
+            if op in ("==", "in") and field != DOCUMENT_ID:
+                index = self._client._index(self._collection, field)
+                values = value if op == "in" else [value]
+                doc_ids = set()
+                for v in values:
+                    try:
+                        doc_ids |= index.get(v, set())
+                    except TypeError:
+                        continue
+                return ((doc_id, store[doc_id]) for doc_id in doc_ids)
+        return store.items()
+
+    def _evaluate(self):
+        orders = self._effective_orders()
+        rows = []
+        for doc_id, (data, update_time) in self._candidates():
+            try:
+                if not all(
+                    _matches(self._field(doc_id, data, f), op, v)
+                    for f, op, v in self._filters
+                ):
+                    continue
+                key = [self._field(doc_id, data, f) for f, _ in orders]
+            except KeyError:
+                continue
+            rows.append((key, doc_id, data, update_time))
+
+        for position in reversed(range(len(orders))):
+            rows.sort(key=lambda row: row[0][position], reverse=orders[position][1])
+
+        if self._start is not None:
+            rows = [row for row in rows if self._after_start(row[0], orders)]
+        if self._end is not None:
+            rows = [row for row in rows if self._before_end(row[0], orders)]
+        if self._limit is not None:
+            rows = rows[: self._limit]
+        return rows
+
+    @staticmethod
+    def _compare(key, cursor, orders):
+        for value, bound, (_, descending) in zip(key, cursor, orders):
+            if value != bound:
+                result = -1 if value < bound else 1
+                return -result if descending else result
+        return 0
+
+    def _after_start(self, key, orders):
+        values, inclusive = self._start
+        result = self._compare(key, values, orders)
+        return result > 0 or (inclusive and result == 0)
+
+    def _before_end(self, key, orders):
+        values, inclusive = self._end
+        result = self._compare(key, values, orders)
+        return result < 0 or (inclusive and result == 0)
+
+    def stream(self, transaction=None):
+        client = self._client
+        with client._lock:
+            rows = self._evaluate()
+            client.rpcs += 1
+            client.reads += max(len(rows), 1)
+            snapshots = []
+            for _, doc_id, data, update_time in rows:
+                if self._projection is not None:
+                    data = {
+                        f: _lookup(data, f) for f in self._projection
+                        if f != DOCUMENT_ID and _has(data, f)
+                    }
+                reference = FakeDocumentReference(client, self._collection, doc_id)
+                snapshots.append(FakeSnapshot(reference, _clone(data), update_time))
+        return iter(snapshots)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+def _has(data, path):
+    try:
+        _lookup(data, path)
+        return True
+    except KeyError:
+        return False
+
+
+class ChangeType(enum.Enum):
+    ADDED = 1
+    MODIFIED = 2
+    REMOVED = 3
+
+
+class FakeDocumentChange:
+    def __init__(self, type, document):
+        self.type = type
+        self.document = document
+
+
+class FakeWatch:
+    def __init__(self, client, collection, callback):
+        self._client = client
+        self._collection = collection
+        self._callback = callback
+
+    def unsubscribe(self):
+        with self._client._lock:
+            watches = self._client._watches[self._collection]
+            if self in watches:
+                watches.remove(self)
+
+
+class FakeCollectionReference(FakeQuery):
+    @property
+    def id(self):
+        return self._collection
+
+    def on_snapshot(self, callback):
+        """Deliver the whole collection as ADDED, then each commit's changes.
+
+        Callbacks run synchronously on the committing thread.
+        """
+        client = self._client
+        with client._lock:
+            watch = FakeWatch(client, self._collection, callback)
+            client._watches[self._collection].append(watch)
+            changes = [
+                (ChangeType.ADDED, doc_id, value)
+                for doc_id, value in client._collections[self._collection].items()
+            ]
+            client._notify(self._collection, changes, [watch])
+        return watch
+
+    def document(self, document_id=None):
+        if document_id is None:
+            document_id = f"auto{next(_id_counter):016d}"
+        return FakeDocumentReference(self._client, self._collection, document_id)
+
+    def add(self, document_data, document_id=None):
+        reference = self.document(document_id)
+        reference.create(document_data)
+        return reference._client._now(), reference
+
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(("set", reference, document_data, merge))
+        return self
+
+    def create(self, reference, document_data):
+        self._writes.append(("create", reference, document_data, None))
+        return self
+
+    def update(self, reference, field_updates, option=None):
+        self._writes.append(("update", reference, field_updates, option))
+        return self
+
+    def delete(self, reference, option=None):
+        self._writes.append(("delete", reference, None, option))
+        return self
+
+    def commit(self, retry=None, timeout=None):
+        results = self._client._commit(self._writes)
+        self._writes = []
+        return results
+
+
+class FakeFirestore:
+    """Thread-safe in-memory Firestore with read/write/RPC counters."""
+
+    def __init__(self):
+        self._collections = defaultdict(dict)
+        self._lock = threading.RLock()
+        self._tick = itertools.count(1)
+        self.reads = 0
+        self.writes = 0
+        self.rpcs = 0
+        self.fail_commits = 0
+        self._versions = defaultdict(int)
+        self._indexes = {}
+        self._watches = defaultdict(list)
+
+    def _notify(self, collection, changes, watches=None):
+        watches = self._watches[collection] if watches is None else watches
+        if not watches or not changes:
+            return
+        snapshots = [
+            FakeDocumentChange(
+                kind,
+                FakeSnapshot(
+                    FakeDocumentReference(self, collection, doc_id),
+                    value[0] if value else None,
+                    value[1] if value else None,
+                ),
+            )
+            for kind, doc_id, value in changes
+        ]
+        for watch in list(watches):
+            watch._callback([], snapshots, self._now()[0])
+
+    def _index(self, collection, field):
+        cached = self._indexes.get((collection, field))
+        if cached is not None and cached[0] == self._versions[collection]:
+            return cached[1]
+
+        index = defaultdict(set)
+        for doc_id, (data, _) in self._collections[collection].items():
+            try:
+                index[_lookup(data, field)].add(doc_id)
+            except (KeyError, TypeError):
+                continue
+        self._indexes[(collection, field)] = (self._versions[collection], index)
+        return index
+
+    def _now(self):
+        # Strictly increasing so update_time works as a precondition token.
+        return datetime.now(timezone.utc).replace(microsecond=0), next(self._tick)
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def write_option(self, last_update_time=None, exists=None):
+        return FakeLastUpdateOption(last_update_time)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        with self._lock:
+            self.rpcs += 1
+            self.reads += len(references)
+            return iter([reference._snapshot() for reference in references])
+
+    def load(self, collection, documents):
+        """Bulk-insert ``{doc_id: data}`` without counting writes (test setup)."""
+        with self._lock:
+            store = self._collections[collection]
+            changes = []
+            for doc_id, data in documents.items():
+                kind = ChangeType.MODIFIED if doc_id in store else ChangeType.ADDED
+                store[doc_id] = (data, self._now())
+                changes.append((kind, doc_id, store[doc_id]))
+            self._versions[collection] += 1
+            self._notify(collection, changes)
+
+    def documents(self, collection):
+        return {
+            doc_id: _clone(data)
+            for doc_id, (data, _) in self._collections[collection].items()
+        }
+
+    def close(self):
+        pass
+
+    def reset_counters(self):
+        self.reads = self.writes = self.rpcs = 0
+
+    def _commit(self, writes):
+        with self._lock:
+            self.rpcs += 1
+            if self.fail_commits:
+                self.fail_commits -= 1
+                raise exceptions.ServiceUnavailable("Injected commit failure")
+
+            staged = {}
+
+            def current(reference):
+                key = (reference._collection, reference.id)
+                if key in staged:
+                    return staged[key]
+                stored = self._collections[reference._collection].get(reference.id)
+                return stored
+
+            update_time = self._now()
+            for kind, reference, data, option in writes:
+                stored = current(reference)
+                if isinstance(option, FakeLastUpdateOption):
+                    if stored is None or stored[1] != option.last_update_time:
+                        raise exceptions.FailedPrecondition(
+                            f"{reference.path} was modified concurrently"
+                        )
+                data = _resolve(data, update_time[0])
+
+                if kind == "create":
+                    if stored is not None:
+                        raise exceptions.Conflict(f"{reference.path} already exists")
+                    new = data
+                elif kind == "set":
+                    new = {**stored[0], **data} if merge_ok(stored, option) else data
+                elif kind == "update":
+                    if stored is None:
+                        raise exceptions.NotFound(f"{reference.path} not found")
+                    new = _clone(stored[0])
+                    for path, value in data.items():
+                        target = new
+                        parts = path.split(".")
+                        for part in parts[:-1]:
+                            target = target.setdefault(part, {})
+                        target[parts[-1]] = value
+                else:
+                    new = None
+                staged[(reference._collection, reference.id)] = (
+                    None if new is None else (new, update_time)
+                )
+
+            changes = defaultdict(list)
+            for (collection, doc_id), value in staged.items():
+                self._versions[collection] += 1
+                store = self._collections[collection]
+                if value is None:
+                    if store.pop(doc_id, None) is not None:
+                        changes[collection].append((ChangeType.REMOVED, doc_id, None))
+                else:
+                    kind = ChangeType.MODIFIED if doc_id in store else ChangeType.ADDED
+                    store[doc_id] = value
+                    changes[collection].append((kind, doc_id, value))
+            self.writes += len(writes)
+            for collection, collection_changes in changes.items():
+                self._notify(collection, collection_changes)
+            return [FakeWriteResult(update_time) for _ in writes]
+
+
+def merge_ok(stored, merge):
+    return stored is not None and merge is True
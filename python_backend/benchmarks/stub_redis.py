@@ -0,0 +1,114 @@
+"""Minimal Redis-protocol server for exercising ``RedisCache`` without Redis.
+
+Supports the commands the cache uses (GET, MGET, SET with PX, DEL, SCAN,
+AUTH, SELECT, PING) against one in-memory keyspace. Like ``StubUpstream``
+it runs in its own process.
+"""
+
+import fnmatch
+import multiprocessing
+import socketserver
+import threading
+import time
+
+
+class _RedisHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _bulk(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _get(self, key):
+        entry = self.server.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.server.data[key]
+            return None
+        return value
+
+    def _execute(self, name, args):
+        data = self.server.data
+        if name in (b"PING", b"AUTH", b"SELECT"):
+            return b"+OK\r\n" if name != b"PING" else b"+PONG\r\n"
+        if name == b"GET":
+            return self._bulk(self._get(args[0]))
+        if name == b"MGET":
+            return b"*%d\r\n" % len(args) + b"".join(self._bulk(self._get(k)) for k in args)
+        if name == b"SET":
+            expires_at = None
+            if len(args) >= 4 and args[2].upper() == b"PX":
+                expires_at = time.monotonic() + int(args[3]) / 1000
+            data[args[0]] = (args[1], expires_at)
+            return b"+OK\r\n"
+        if name == b"DEL":
+            removed = sum(data.pop(key, None) is not None for key in args)
+            return b":%d\r\n" % removed
+        if name == b"SCAN":
+            pattern = args[args.index(b"MATCH") + 1].decode() if b"MATCH" in args else "*"
+            keys = [
+                key for key in list(data)
+                if fnmatch.fnmatchcase(key.decode(), pattern) and self._get(key) is not None
+            ]
+            body = b"".join(self._bulk(key) for key in keys)
+            return b"*2\r\n" + self._bulk(b"0") + b"*%d\r\n" % len(keys) + body
+        return b"-ERR unknown command '%s'\r\n" % name
+
+    def handle(self):
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            with self.server.lock:
+                reply = self._execute(command[0].upper(), command[1:])
+            self.wfile.write(reply)
+            self.wfile.flush()
+
+
+class _RedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _serve(address_queue):
+    server = _RedisServer(("127.0.0.1", 0), _RedisHandler)
+    server.data = {}
+    server.lock = threading.Lock()
+    address_queue.put(server.server_address)
+    server.serve_forever()
+
+
+class StubRedis:
+    """Use as a context manager; ``url`` is a ``redis://`` URL for it."""
+
+    def __init__(self):
+        context = multiprocessing.get_context("fork")
+        self._addresses = context.Queue()
+        self._process = context.Process(target=_serve, args=(self._addresses,), daemon=True)
+        self.address = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.address
+        return f"redis://{host}:{port}/0"
+
+    def __enter__(self):
+        self._process.start()
+        self.address = self._addresses.get(timeout=10)
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join()
@@ -0,0 +1,89 @@
+"""Local HTTP stub standing in for Xendit / Lalamove during benchmarks.
+
+The stub runs in its own process so its handler threads never compete with
+the code under measurement for the GIL.
+"""
+
+import json
+import multiprocessing
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        status, payload, *extra = self.server.responder(self.command, self.path, body)
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in (extra[0] if extra else {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        pass  # clients that time out close the socket mid-reply
+
+
+def default_responder(method, path, body):
+    return 200, {"id": path.rsplit("/", 1)[-1], "status": "SUCCEEDED"}
+
+
+def _serve(address_queue, delay, responder):
+    server = _StubServer(("127.0.0.1", 0), _StubHandler)
+    server.delay = delay
+    server.responder = responder
+    address_queue.put(server.server_address)
+    server.serve_forever()
+
+
+class StubUpstream:
+    """Runs a threaded JSON server on localhost; use as a context manager.
+
+    ``responder(method, path, body)`` returns ``(status, payload)`` or
+    ``(status, payload, headers)`` and must be a module-level function so it
+    can be handed to the stub process.
+    """
+
+    def __init__(self, delay: float = 0.0, responder=default_responder):
+        context = multiprocessing.get_context("fork")
+        self._addresses = context.Queue()
+        self._process = context.Process(
+            target=_serve, args=(self._addresses, delay, responder), daemon=True
+        )
+        self.address = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._process.start()
+        self.address = self._addresses.get(timeout=10)
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join()
@@ -0,0 +1,77 @@
+"""Synthetic events/contracts/transactions/deliveries for sweep benchmarks."""
+
+import random
+from datetime import date, timedelta
+
+from services.shard_lease import SHARD_ALPHABET
+from services.write_pipeline import WritePipeline
+
+
+def auto_id(rng: random.Random) -> str:
+    return "".join(rng.choice(SHARD_ALPHABET) for _ in range(20))
+
+
+def load_synthetic(db, events: int, seed: int = 7, expired_ratio: float = 0.6):
+    """Load ``events`` events plus related documents into ``db``.
+
+    Every event gets one contract. A quarter of the contracts have an active
+    transaction, an eighth have a delivery and a tenth are already completed;
+    every fifth event without a contract gets an application.
+    Returns the number of contracts the sweep is expected to cancel.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    collections = {name: {} for name in ("events", "contracts", "transactions", "deliveries", "applications")}
+    expected = 0
+
+    for i in range(events):
+        expired = rng.random() < expired_ratio
+        offset = rng.randint(1, 365)
+        event_date = today - timedelta(days=offset) if expired else today + timedelta(days=offset)
+        event_id = auto_id(rng)
+        collections["events"][event_id] = {
+            "event_name": f"Event {i}",
+            "event_date": {"date_value": event_date.isoformat()},
+            "user_id": f"planner-{i % 500}",
+        }
+
+        if i % 3 == 2:
+            if i % 5 == 0:
+                collections["applications"][auto_id(rng)] = {"event_id": event_id}
+            continue
+
+        contract_id = auto_id(rng)
+        status = "Completed" if i % 10 == 0 else "Pending"
+        collections["contracts"][contract_id] = {
+            "event_id": event_id,
+            "status": status,
+            "supplier_id": f"supplier-{i % 700}",
+            "planner_id": f"planner-{i % 500}",
+        }
+
+        active = False
+        if i % 4 == 1:
+            collections["transactions"][auto_id(rng)] = {"contract_id": contract_id, "status": "HOLD"}
+            active = True
+        elif i % 4 == 3:
+            collections["transactions"][auto_id(rng)] = {"contract_id": contract_id, "status": "REFUNDED"}
+        if i % 8 == 3:
+            collections["deliveries"][auto_id(rng)] = {"contract_id": contract_id}
+            active = True
+
+        if expired and not active and status == "Pending":
+            expected += 1
+
+    for name, documents in collections.items():
+        _load(db, name, documents)
+    return expected
+
+
+def _load(db, collection, documents):
+    if hasattr(db, "load"):
+        db.load(collection, documents)
+        return
+
+    with WritePipeline(db) as pipeline:
+        for doc_id, data in documents.items():
+            pipeline.add([("set", db.collection(collection).document(doc_id), data)])
@@ -1,25 +1,32 @@
-from services.gemini_service import GeminiService
-from services.payment_service import PaymentService
-from services.payout_service import PayoutService
-from services.refund_service import RefundService
-from services.delivery_service import DeliveryService
+from fastapi import Request
 
+from services.job_runner import JobRunner
+from services.registry import ServiceRegistry
 
-def get_gemini_service():
-    return GeminiService()
 
+def get_registry(request: Request) -> ServiceRegistry:
+    return request.app.state.services
 
-def get_payment_service():
-    return PaymentService()
 
+def get_gemini_service(request: Request):
+    return get_registry(request).gemini
 
-def get_payout_service():
-    return PayoutService()
 
+def get_payment_service(request: Request):
+    return get_registry(request).payment
 
-def get_refund_service():
-    return RefundService()
 
+def get_payout_service(request: Request):
+    return get_registry(request).payout
 
-def get_delivery_service():
-    return DeliveryService()
+
+def get_refund_service(request: Request):
+    return get_registry(request).refund
+
+
+def get_delivery_service(request: Request):
+    return get_registry(request).delivery
+
+
+def get_job_runner(request: Request) -> JobRunner:
+    return get_registry(request).jobs
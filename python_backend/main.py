@@ -1,8 +1,49 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import payout, recommendations, payments, refund, delivery, auto_cancel
+from routes import (
+    payout,
+    recommendations,
+    payments,
+    refund,
+    delivery,
+    auto_cancel,
+    metrics,
+)
+from services.metrics import MetricsMiddleware
+from services.registry import ServiceRegistry
+from services.upstream import DeadlineMiddleware
+from services.structured_logging import configure_logging
+
+configure_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.services = ServiceRegistry()
+    # Opt-in, e.g. WARMUP_SERVICES=gemini,payment: build those services in
+    # the background so their first request skips the SDK import.
+    warmup = [name.strip() for name in os.getenv("WARMUP_SERVICES", "").split(",")]
+    warmup = [name for name in warmup if name]
+    if warmup:
+        app.state.warmup = asyncio.create_task(
+            asyncio.to_thread(app.state.services.warm_up, warmup)
+        )
+    try:
+        yield
+    finally:
+        await app.state.services.aclose()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # CORS Configuration
 app.add_middleware(
@@ -23,6 +64,7 @@ app.include_router(payments.router)
 app.include_router(refund.router)
 app.include_router(delivery.router)
 app.include_router(auto_cancel.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -11,7 +11,10 @@ class Supplier(BaseModel):
 
 class RecommendRequest(BaseModel):
     user_prompt: str
-    suppliers: List[Supplier]
+    # Omit suppliers to rank against the server-side supplier catalog.
+    suppliers: Optional[List[Supplier]] = None
+    category: Optional[str] = None
+    min_rating: Optional[float] = None
 
 
 class EventCredential(BaseModel):
@@ -33,6 +36,15 @@ class DeliveryCreate(BaseModel):
     remarks: Optional[str] = None
 
 
+class BulkDeliveryCreate(BaseModel):
+    deliveries: List[DeliveryCreate]
+
+
+class QuotationCreate(BaseModel):
+    serviceType: str
+    stops: List[Stop]
+
+
 class DeliveryResponse(BaseModel):
     orderId: str
     status: str
@@ -47,6 +59,12 @@ class StatusResponse(BaseModel):
     status: str
 
 
+class InvoiceCallback(BaseModel):
+    id: str
+    status: str
+    external_id: Optional[str] = None
+
+
 class RefundCredential(BaseModel):
     invoice_id: str
     amount: float
@@ -67,3 +85,7 @@ class PayoutCredential(BaseModel):
     account_holder_name: str
     account_number: str
     amount: int
+
+
+class PayoutBatchRequest(BaseModel):
+    payouts: List[PayoutCredential]
@@ -1,14 +1,75 @@
-from fastapi import APIRouter, HTTPException
-from services.auto_cancel_service import AutoCancelService
+from datetime import datetime, timezone
+from typing import Optional
+from functools import partial
+from fastapi import APIRouter, Depends, HTTPException
+from services.job_runner import JobRunner, Progress
+from services.registry import ServiceRegistry
+from dependencies import get_job_runner, get_registry
 
 router = APIRouter(prefix="/api/v1")
 
 
-@router.get("/run-auto-cancel")
-def run_auto_cancel():
-    service = AutoCancelService()
-    try:
-        service.auto_cancel_contracts()
-        service.auto_delete_expired_events()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Auto-cancel failed: {e}")
+def run_auto_cancel_job(
+    progress: Progress,
+    registry: ServiceRegistry,
+    incremental: bool = False,
+    shards: int = 0,
+    run_id: str = None,
+):
+    # Imported here so google-cloud's client libraries load with the first
+    # run rather than at startup.
+    from services.auto_cancel_service import AutoCancelService
+    from services.shard_lease import ShardedSweep, ShardLeases
+
+    service = AutoCancelService(db=registry.firestore)
+    if shards > 1:
+        sweep = ShardedSweep(service, ShardLeases(service.db), shards)
+        return sweep.run(run_id, progress)
+    return service.run(progress, incremental=incremental)
+
+
+@router.get("/run-auto-cancel", status_code=202)
+def run_auto_cancel(
+    incremental: bool = False,
+    shards: int = 0,
+    run_id: Optional[str] = None,
+    registry: ServiceRegistry = Depends(get_registry),
+    jobs: JobRunner = Depends(get_job_runner),
+):
+    """Start a sweep in the background and return its job id.
+
+    With ``shards > 1`` every worker triggered with the same ``run_id`` shares
+    the run's shard leases. ``run_id`` defaults to the current UTC hour, so a
+    second trigger within that hour finds the shards done and sweeps nothing;
+    pass a new ``run_id`` to sweep again. The response echoes the ``run_id``.
+    """
+    if shards > 1:
+        if incremental:
+            raise HTTPException(
+                status_code=400,
+                detail="incremental sweeps cannot be sharded; sharded runs scan in full",
+            )
+        run_id = run_id or datetime.now(timezone.utc).strftime("%Y-%m-%dT%H")
+    else:
+        run_id = None
+
+    job, created = jobs.submit(
+        partial(run_auto_cancel_job, registry=registry),
+        incremental=incremental,
+        shards=shards,
+        run_id=run_id,
+    )
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "already_running": not created,
+        "run_id": job["params"]["run_id"],
+    }
+
+
+@router.get("/run-auto-cancel/{job_id}")
+def auto_cancel_status(job_id: str, jobs: JobRunner = Depends(get_job_runner)):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
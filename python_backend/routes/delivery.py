@@ -1,18 +1,48 @@
 from fastapi import APIRouter, HTTPException, Depends
 from services.delivery_service import DeliveryService
-from models.schemas import DeliveryCreate
+from models.schemas import BulkDeliveryCreate, DeliveryCreate, QuotationCreate
 from dependencies import get_delivery_service
 
 router = APIRouter(prefix="/api/v1")
 
 
+@router.post("/delivery/quotation")
+async def get_quotation(
+    payload: QuotationCreate,
+    service: DeliveryService = Depends(get_delivery_service),
+):
+    if len(payload.stops) < 2:
+        raise HTTPException(status_code=400, detail="At least 2 stops are required")
+    try:
+        return await service.get_quotation(payload)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/delivery")
-def create_delivery(
+async def create_delivery(
     payload: DeliveryCreate,
     service: DeliveryService = Depends(get_delivery_service),
 ):
     try:
-        result = service.create_delivery(payload)
+        result = await service.create_delivery(payload)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/delivery/bulk")
+async def create_deliveries(
+    payload: BulkDeliveryCreate,
+    service: DeliveryService = Depends(get_delivery_service),
+):
+    try:
+        deliveries = await service.create_deliveries(payload.deliveries)
+        succeeded = sum(1 for delivery in deliveries if delivery["success"])
+        return {
+            "data": deliveries,
+            "succeeded": succeeded,
+            "failed": len(deliveries) - succeeded,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
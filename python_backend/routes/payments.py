@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from models.schemas import EventCredential
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from models.schemas import EventCredential, InvoiceCallback
 from dependencies import get_payment_service
 from services.payment_service import PaymentService
 
@@ -11,7 +12,7 @@ async def pay_supplier(
     data: EventCredential, service: PaymentService = Depends(get_payment_service)
 ):
     try:
-        invoice = service.create_invoice(data)
+        invoice = await run_in_threadpool(service.create_invoice, data)
         return {"data": invoice.__dict__, "invoice_url": invoice.invoice_url}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -22,7 +23,20 @@ async def check_status(
     id: str = Query(...), service: PaymentService = Depends(get_payment_service)
 ):
     try:
-        invoice = service.check_status(id)
-        return {"status": invoice.status}
+        status = await run_in_threadpool(service.get_status, id)
+        return {"status": status}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/payment/webhook")
+async def invoice_webhook(
+    callback: InvoiceCallback,
+    x_callback_token: str = Header(None),
+    service: PaymentService = Depends(get_payment_service),
+):
+    if not service.verify_callback_token(x_callback_token):
+        raise HTTPException(status_code=401, detail="Invalid callback token")
+
+    await run_in_threadpool(service.record_status, callback.id, callback.status)
+    return {"received": True}
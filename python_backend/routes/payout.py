@@ -1,5 +1,8 @@
+import json
+from contextlib import aclosing
 from fastapi import APIRouter, HTTPException, Depends
-from models.schemas import PayoutCredential
+from fastapi.responses import StreamingResponse
+from models.schemas import PayoutBatchRequest, PayoutCredential
 from services.payout_service import PayoutService
 from dependencies import get_payout_service
 
@@ -13,18 +16,46 @@ async def bank_withdrawal(
 ):
 
     try:
-        return disbursement.create_payout(credential)
+        return await disbursement.create_payout(credential)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/payout/batch")
+async def batch_withdrawal(
+    batch: PayoutBatchRequest,
+    disbursement: PayoutService = Depends(get_payout_service),
+):
+    """Stream one NDJSON line per payout as it completes, then a summary line.
+
+    Re-sending the same batch resumes it: finished payouts are replayed
+    (``"replayed": true``) and only the rest reach Xendit.
+    """
+    errors = await disbursement.validate_batch(batch.payouts)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+
+    async def lines():
+        succeeded = failed = 0
+        async with aclosing(disbursement.create_payouts(batch.payouts)) as results:
+            async for result in results:
+                if result["success"]:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield json.dumps(result) + "\n"
+        yield json.dumps({"done": True, "succeeded": succeeded, "failed": failed}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.get("/payout/check-status/{payout_id}")
 async def check_status(
     payout_id: str, service: PayoutService = Depends(get_payout_service)
 ):
     try:
-        payout = service.check_status(payout_id)
+        payout = await service.check_status(payout_id)
         return payout
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
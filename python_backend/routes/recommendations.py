@@ -1,20 +1,69 @@
+import json
+from contextlib import aclosing
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from models.schemas import RecommendRequest
-from dependencies import get_gemini_service
+from dependencies import get_gemini_service, get_registry
 from services.gemini_service import GeminiService
+from services.registry import ServiceRegistry
+from services.supplier_catalog import filter_suppliers
 
 router = APIRouter(prefix="/api/v1")
 
 
+async def resolve_suppliers(req: RecommendRequest, registry: ServiceRegistry):
+    """Return the candidate suppliers and, for catalog lookups, a cache scope."""
+    if req.suppliers is not None:
+        return filter_suppliers(req.suppliers, req.category, req.min_rating), None
+
+    catalog = registry.supplier_catalog
+    await catalog.wait_ready()
+    return catalog.search(req.category, req.min_rating)
+
+
 @router.post("/recommend")
 async def recommend_suppliers(
-    req: RecommendRequest, service: GeminiService = Depends(get_gemini_service)
+    req: RecommendRequest,
+    service: GeminiService = Depends(get_gemini_service),
+    registry: ServiceRegistry = Depends(get_registry),
 ):
     try:
+        suppliers, scope = await resolve_suppliers(req, registry)
         return {
-            "recommendations": service.get_recommendations(
-                req.user_prompt, req.suppliers
+            "recommendations": await service.get_recommendations(
+                req.user_prompt, suppliers, cache_scope=scope
             )
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/recommend/stream")
+async def stream_recommendations(
+    req: RecommendRequest,
+    service: GeminiService = Depends(get_gemini_service),
+    registry: ServiceRegistry = Depends(get_registry),
+):
+    async def events():
+        try:
+            suppliers, scope = await resolve_suppliers(req, registry)
+            async with aclosing(
+                service.stream_recommendations(
+                    req.user_prompt, suppliers, cache_scope=scope
+                )
+            ) as lines:
+                async for line in lines:
+                    yield _sse("recommendation", line)
+            yield _sse("done", {})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
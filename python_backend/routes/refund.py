@@ -11,8 +11,13 @@ async def refund_payment(
     data: RefundRequest, service: RefundService = Depends(get_refund_service)
 ):
     try:
-        refund = service.create_refund(data)
-        return {"data": refund}
+        refunds = await service.create_refund(data)
+        succeeded = sum(1 for refund in refunds if refund["success"])
+        return {
+            "data": refunds,
+            "succeeded": succeeded,
+            "failed": len(refunds) - succeeded,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -22,7 +27,7 @@ async def refund_status(
     data: RefundStatusRequest, service: RefundService = Depends(get_refund_service)
 ):
     try:
-        statuses = service.get_multiple_refunds(data.refund_ids)
+        statuses = await service.get_multiple_refunds(data.refund_ids)
         return {"data": statuses}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
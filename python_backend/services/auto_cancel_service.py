@@ -1,30 +1,154 @@
-from google.cloud import firestore
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import json
+import logging
 import os
-from dotenv import load_dotenv
+from services.job_runner import Progress
+from services.metrics import track_upstream
+from services.write_pipeline import WritePipeline
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Firestore caps "in" filters at 30 values and a query at 30 disjunctions.
+FIRESTORE_IN_LIMIT = 30
+GET_ALL_CHUNK_SIZE = 300
+ACTIVE_TRANSACTION_STATUSES = ["HOLD", "COMPLETED"]
+TERMINAL_CONTRACT_STATUSES = ["Cancelled", "Completed"]
+SWEEP_CHECKPOINTS = "sweep_checkpoints"
+# Incremental sweeps re-scan this many days before their checkpoint, so
+# events written after a run (dated that day or backdated) are still seen.
+INCREMENTAL_OVERLAP_DAYS = int(os.getenv("AUTO_CANCEL_OVERLAP_DAYS", "1"))
+
+
+def build_firestore_client():
+    """Create the Firestore client from the environment.
+
+    Uses the local emulator when ``FIRESTORE_EMULATOR_HOST`` is set, otherwise
+    the service account in ``GOOGLE_APPLICATION_CREDENTIALS_JSON``.
+    """
+    from google.cloud import firestore
+
+    if os.getenv("FIRESTORE_EMULATOR_HOST"):
+        return firestore.Client(project=os.getenv("FIRESTORE_PROJECT_ID", "demo-eventpro"))
+
+    service_account_info = json.loads(os.environ["GOOGLE_APPLICATION_CREDENTIALS_JSON"])
+    return firestore.Client.from_service_account_info(service_account_info)
+
+
+def chunked(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
 
 
 class AutoCancelService:
 
-    def __init__(self):
-        service_account_info = json.loads(
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS_JSON"]
+    def __init__(self, db=None):
+        self.db = db if db is not None else build_firestore_client()
+        self.reads = 0
+
+    def _read(self, docs, operation="query"):
+        """Materialize a query/get result and count it towards ``self.reads``.
+
+        Firestore bills one read per returned document and at least one read
+        per query, so empty results still count once.
+        """
+        with track_upstream("firestore", operation):
+            docs = list(docs)
+        self.reads += max(len(docs), 1)
+        return docs
+
+    def _get_events(self, event_ids):
+        """Fetch events by id with batched multi-document gets."""
+        events = {}
+        for chunk in chunked(sorted(event_ids), GET_ALL_CHUNK_SIZE):
+            refs = [self.db.collection("events").document(eid) for eid in chunk]
+            for snapshot in self._read(self.db.get_all(refs), "get_all"):
+                if snapshot.exists:
+                    events[snapshot.id] = snapshot.to_dict()
+        return events
+
+    def _docs_matching(self, collection, field, values, extra_filters=(), select=None):
+        """Run chunked ``field in values`` queries and return every match."""
+        chunk_size = FIRESTORE_IN_LIMIT
+        for _, _, filter_values in extra_filters:
+            chunk_size //= len(filter_values)
+
+        docs = []
+        for chunk in chunked(values, chunk_size):
+            query = self.db.collection(collection).where(field, "in", chunk)
+            for filter_field, op, filter_value in extra_filters:
+                query = query.where(filter_field, op, filter_value)
+            if select is not None:
+                query = query.select(select)
+            docs.extend(self._read(query.stream()))
+        return docs
+
+    def _ids_with_matches(self, collection, field, values, extra_filters=()):
+        """Return the subset of ``values`` that at least one document references."""
+        docs = self._docs_matching(
+            collection, field, values, extra_filters, select=[field]
+        )
+        return {doc.get(field) for doc in docs}
+
+    def _id_range_query(self, collection, id_range):
+        """Limit a collection scan to document ids in ``[start, end)``."""
+        query = self.db.collection(collection)
+        if id_range is None:
+            return query
+
+        start, end = id_range
+        query = query.order_by("__name__")
+        if start is not None:
+            query = query.start_at({"__name__": start})
+        if end is not None:
+            query = query.end_before({"__name__": end})
+        return query
+
+    def _load_checkpoint(self, name):
+        with track_upstream("firestore", "get"):
+            snapshot = self.db.collection(SWEEP_CHECKPOINTS).document(name).get()
+        self.reads += 1
+        return snapshot.to_dict().get("watermark") if snapshot.exists else None
+
+    def _save_checkpoint(self, name, watermark):
+        self.db.collection(SWEEP_CHECKPOINTS).document(name).set(
+            {"watermark": watermark, "updated_at": datetime.now(timezone.utc)}
         )
-        self.db = firestore.Client.from_service_account_info(service_account_info)
+
+    def _newly_expired_events(self, checkpoint):
+        """Range-query events dated up to today, from just before ``checkpoint``.
+
+        An event dated today already counts as past (midnight < now), so the
+        upper bound is inclusive. The lower bound re-scans the checkpoint day
+        and ``INCREMENTAL_OVERLAP_DAYS`` before it: an event dated today can be
+        created after today's run, and re-examining handled events is a no-op
+        (deleted events are gone, cancelled contracts are terminal). Events
+        backdated further than the overlap are only caught by a full scan.
+        Returns the snapshots and the new watermark.
+        """
+        today = datetime.now().strftime("%Y-%m-%d")
+        query = self.db.collection("events").where(
+            "event_date.date_value", "<=", today
+        )
+        if checkpoint:
+            since = self.safe_parse_date(checkpoint)
+            if since is not None:
+                since -= timedelta(days=INCREMENTAL_OVERLAP_DAYS)
+                query = query.where(
+                    "event_date.date_value", ">=", since.strftime("%Y-%m-%d")
+                )
+        return self._read(query.stream()), today
 
     def safe_parse_date(self, date_str):
         """Safely parse YYYY-MM-DD date strings."""
         try:
             return datetime.strptime(date_str, "%Y-%m-%d")
         except (ValueError, TypeError):
-            print(f"⚠️ Invalid date format skipped: {date_str}")
+            logger.warning("Invalid date format skipped", extra={"date": date_str})
             return None
 
-    def send_contract_notification(self, receiver_id, contract_id, event_name, role):
-        """Add a notification document for supplier or planner."""
+    def contract_notification_write(self, receiver_id, contract_id, event_name):
+        """Build the notification write for a supplier or planner."""
         title = "Contract Auto-Cancelled"
         message = (
             f"The contract for '{event_name}' has been automatically cancelled because the event has passed "
@@ -42,11 +166,10 @@ class AutoCancelService:
             "created_at": datetime.now(timezone.utc),
         }
 
-        self.db.collection("notifications").add(notification_data)
-        print(f"📩 Notification sent to {role}: {receiver_id}")
+        return ("set", self.db.collection("notifications").document(), notification_data)
 
-    def send_event_notification(self, receiver_id, event_id, event_name, role):
-        """Send notification that event has been deleted."""
+    def event_notification_write(self, receiver_id, event_name):
+        """Build the notification write for a deleted event."""
         title = "Event Deleted"
         message = (
             f"The event '{event_name}' has been automatically deleted because it has passed "
@@ -62,130 +185,241 @@ class AutoCancelService:
             "created_at": datetime.now(timezone.utc),
         }
 
-        self.db.collection("notifications").add(notification_data)
-        print(f"📩 Event notification sent to {role}: {receiver_id}")
+        return ("set", self.db.collection("notifications").document(), notification_data)
+
+    def auto_delete_expired_events(
+        self, incremental=False, id_range=None, progress=None, before_flush=None
+    ):
+        """Delete past events that have NO contracts and NO applications.
+
+        With ``incremental=True`` only events that expired since the last
+        incremental run are examined, instead of the whole collection.
+        ``id_range`` restricts a full scan to one shard of event ids.
+        ``progress`` counts scanned documents and deletions as they commit;
+        ``before_flush`` runs before every batch commit (see ``WritePipeline``).
+        """
+        progress = progress if progress is not None else Progress()
+        if incremental and id_range is not None:
+            raise ValueError("Sharded sweeps scan their id range in full")
+        logger.info("Checking for expired events with no contracts or applications")
+        self.reads = 0
+        if incremental:
+            checkpoint = self._load_checkpoint("expired_events")
+            events_ref, watermark = self._newly_expired_events(checkpoint)
+        else:
+            events_ref = self._read(self._id_range_query("events", id_range).stream())
+        progress.add(documents_scanned=len(events_ref))
+        now = datetime.now()
+
+        expired = []
+        for event_doc in events_ref:
+            event = event_doc.to_dict()
+            event_date_str = event.get("event_date", {}).get("date_value")
 
+            event_date = self.safe_parse_date(event_date_str)
 
-def auto_delete_expired_events(self):
-    """Delete past events that have NO contracts and NO applications."""
-    print(
-        f"[{datetime.now()}] Checking for expired events with no contracts or applications..."
-    )
-    events_ref = self.db.collection("events").stream()
-    now = datetime.now()
+            # Skip invalid or future events
+            if not event_date or event_date >= now:
+                continue
 
-    for event_doc in events_ref:
-        event = event_doc.to_dict()
-        event_id = event_doc.id
-        event_name = event.get("event_name", "Untitled Event")
-        event_date_str = event.get("event_date", {}).get("date_value")
+            expired.append((event_doc.id, event))
 
-        event_date = self.safe_parse_date(event_date_str)
+        expired_ids = [event_id for event_id, _ in expired]
 
-        # Skip invalid or future eventss
-        if not event_date or event_date >= now:
-            continue
+        # Delete only if NO contracts AND NO applications
+        referenced = self._ids_with_matches("contracts", "event_id", expired_ids)
+        referenced |= self._ids_with_matches("applications", "event_id", expired_ids)
 
-        # Fetch ALL contracts for this event
-        contracts = list(
-            self.db.collection("contracts").where("event_id", "==", event_id).stream()
+        pipeline = WritePipeline(
+            self.db,
+            before_flush=before_flush,
+            on_commit=lambda groups: progress.add(events_deleted=groups),
         )
+        for event_id, event in expired:
+            event_name = event.get("event_name", "Untitled Event")
 
-        # Fetch ALL applications for this event
-        applications = list(
-            self.db.collection("applications")
-            .where("event_id", "==", event_id)
-            .stream()
-        )
+            if event_id in referenced:
+                logger.debug(
+                    "Skipping event with contracts or applications",
+                    extra={"event_id": event_id},
+                )
+                continue
 
-        # NEW LOGIC: Delete only if NO contracts AND NO applications
-        if contracts or applications:
-            print(
-                f"⏩ Skipping delete for event {event_id} — it has contracts or applications."
-            )
-            continue
+            # If both empty → delete event, notifying the planner in the same batch
+            logger.debug("Deleting expired event", extra={"event_id": event_id})
+            writes = [("delete", self.db.collection("events").document(event_id), None)]
+
+            planner_id = event.get("user_id") or event.get("planner_id")
+            if planner_id:
+                writes.append(self.event_notification_write(planner_id, event_name))
+
+            pipeline.add(writes, label=event_id)
+        pipeline.flush()
+
+        # Failed groups must be retried next run, so keep the old checkpoint.
+        if incremental and not pipeline.failed:
+            self._save_checkpoint("expired_events", watermark)
+
+        stats = self._run_stats(len(events_ref), pipeline)
+        logger.info(
+            "Expired event cleanup complete",
+            extra={
+                "scanned": stats["scanned"],
+                "deleted": stats["acted"],
+                "reads": self.reads,
+                "writes": pipeline.writes,
+                "commits": pipeline.commits,
+                "failed": len(pipeline.failed),
+            },
+        )
+        return stats
+
+    def run(self, progress=None, incremental=False):
+        """Run both sweeps, reporting into ``progress`` as batches commit."""
+        progress = progress if progress is not None else Progress()
+        progress.update(
+            phase="contracts",
+            documents_scanned=0,
+            contracts_cancelled=0,
+            events_deleted=0,
+        )
 
-        # If both empty → delete event
-        print(f"🗑 Deleting expired event {event_id} ({event_name})")
-        planner_id = event.get("user_id") or event.get("planner_id")
+        contracts = self.auto_cancel_contracts(incremental=incremental, progress=progress)
+        progress.update(phase="events")
+        events = self.auto_delete_expired_events(incremental=incremental, progress=progress)
+        progress.update(phase="done")
 
-        if planner_id:
-            self.send_event_notification(planner_id, event_id, event_name, "planner")
+        return {"contracts": contracts, "events": events}
 
-        self.db.collection("events").document(event_id).delete()
+    def _run_stats(self, scanned, pipeline):
+        return {
+            "scanned": scanned,
+            "acted": pipeline.groups - len(pipeline.failed),
+            "reads": self.reads,
+            "writes": pipeline.writes,
+            "failed": list(pipeline.failed),
+        }
 
-    def auto_cancel_contracts(self):
-        print(f"[{datetime.now()}] Checking for inactive or expired contracts...")
-        contracts_ref = self.db.collection("contracts").stream()
+    def auto_cancel_contracts(
+        self, incremental=False, id_range=None, progress=None, before_flush=None
+    ):
+        """Cancel contracts whose event has passed with no transactions or deliveries.
+
+        With ``incremental=True`` only contracts of events that expired since
+        the last incremental run are examined, instead of every contract.
+        ``id_range`` restricts a full scan to one shard of contract ids.
+        ``progress`` counts scanned documents and cancellations as they commit;
+        ``before_flush`` runs before every batch commit (see ``WritePipeline``).
+        """
+        progress = progress if progress is not None else Progress()
+        if incremental and id_range is not None:
+            raise ValueError("Sharded sweeps scan their id range in full")
+        logger.info("Checking for inactive or expired contracts")
+        self.reads = 0
+        if incremental:
+            checkpoint = self._load_checkpoint("contracts")
+            event_docs, watermark = self._newly_expired_events(checkpoint)
+            events = {doc.id: doc.to_dict() for doc in event_docs}
+            contracts_ref = self._docs_matching("contracts", "event_id", list(events))
+            scanned = len(event_docs) + len(contracts_ref)
+        else:
+            contracts_ref = self._read(
+                self._id_range_query("contracts", id_range).stream()
+            )
+            scanned = len(contracts_ref)
 
+        candidates = []
         for contract_doc in contracts_ref:
             contract = contract_doc.to_dict()
             contract_id = contract_doc.id
 
-            event_id = contract.get("event_id")
-            if not event_id:
+            if not contract.get("event_id"):
                 continue
 
-            # Fetch event
-            event_ref = self.db.collection("events").document(event_id).get()
-            if not event_ref.exists:
+            if contract.get("status") in TERMINAL_CONTRACT_STATUSES:
                 continue
 
-            event_data = event_ref.to_dict()
-            event_date_str = event_data.get("event_date", {}).get("date_value")
-            event_name = event_data.get("event_name", "Untitled Event")
+            candidates.append((contract_id, contract))
 
-            event_date = self.safe_parse_date(event_date_str)
-            if not event_date:
+        if not incremental:
+            # Prefetch every referenced event once
+            events = self._get_events({c["event_id"] for _, c in candidates})
+            scanned += len(events)
+        progress.add(documents_scanned=scanned)
+
+        now = datetime.now()
+        expired = []
+        for contract_id, contract in candidates:
+            event_data = events.get(contract["event_id"])
+            if event_data is None:
                 continue
 
-            if contract.get("status") in ["Cancelled", "Completed"]:
-                print(
-                    f"⏩ Skipping contract {contract_id} (already {contract.get('status')})"
-                )
+            event_date_str = event_data.get("event_date", {}).get("date_value")
+            event_date = self.safe_parse_date(event_date_str)
+            if not event_date or event_date >= now:
                 continue
 
-            now = datetime.now()
-            if event_date < now:
-                # Check for transactions
-                transactions = (
-                    self.db.collection("transactions")
-                    .where("contract_id", "==", contract_id)
-                    .where("status", "in", ["HOLD", "COMPLETED"])
-                    .get()
-                )
+            expired.append((contract_id, contract, event_data))
 
-                # Check for deliveries
-                deliveries = (
-                    self.db.collection("deliveries")
-                    .where("contract_id", "==", contract_id)
-                    .get()
-                )
+        expired_ids = [contract_id for contract_id, _, _ in expired]
 
-                if not transactions and not deliveries:
-                    print(
-                        f"🚫 Cancelling contract {contract_id} (expired and no activity)"
-                    )
+        # Contracts with transactions or deliveries stay active
+        active = self._ids_with_matches(
+            "transactions",
+            "contract_id",
+            expired_ids,
+            extra_filters=[("status", "in", ACTIVE_TRANSACTION_STATUSES)],
+        )
+        active |= self._ids_with_matches("deliveries", "contract_id", expired_ids)
 
-                    # Update contract status
-                    self.db.collection("contracts").document(contract_id).update(
-                        {
-                            "status": "Cancelled",
-                            "updated_at": datetime.now(timezone.utc),
-                        }
-                    )
+        pipeline = WritePipeline(
+            self.db,
+            before_flush=before_flush,
+            on_commit=lambda groups: progress.add(contracts_cancelled=groups),
+        )
+        for contract_id, contract, event_data in expired:
+            if contract_id in active:
+                continue
 
-                    # Send notifications
-                    supplier_id = contract.get("supplier_id")
-                    planner_id = contract.get("planner_id")
+            event_name = event_data.get("event_name", "Untitled Event")
+            logger.debug("Cancelling contract", extra={"contract_id": contract_id})
+
+            # Status update and notifications commit together
+            writes = [
+                (
+                    "update",
+                    self.db.collection("contracts").document(contract_id),
+                    {
+                        "status": "Cancelled",
+                        "updated_at": datetime.now(timezone.utc),
+                    },
+                )
+            ]
 
-                    if supplier_id:
-                        self.send_contract_notification(
-                            supplier_id, contract_id, event_name, "supplier"
-                        )
-                    if planner_id:
-                        self.send_contract_notification(
-                            planner_id, contract_id, event_name, "planner"
+            for receiver_id in (contract.get("supplier_id"), contract.get("planner_id")):
+                if receiver_id:
+                    writes.append(
+                        self.contract_notification_write(
+                            receiver_id, contract_id, event_name
                         )
+                    )
 
-        print("✅ Auto-cancel process complete.\n")
+            pipeline.add(writes, label=contract_id)
+        pipeline.flush()
+
+        if incremental and not pipeline.failed:
+            self._save_checkpoint("contracts", watermark)
+
+        stats = self._run_stats(scanned, pipeline)
+        logger.info(
+            "Auto-cancel process complete",
+            extra={
+                "scanned": stats["scanned"],
+                "cancelled": stats["acted"],
+                "reads": self.reads,
+                "writes": pipeline.writes,
+                "commits": pipeline.commits,
+                "failed": len(pipeline.failed),
+            },
+        )
+        return stats
@@ -0,0 +1,481 @@
+"""Key-value caches shared by the services.
+
+``TTLCache`` lives in the process. ``SQLiteCache`` and ``RedisCache`` hold
+their entries outside it, so every uvicorn worker (and, for Redis, every
+replica) sees the same cached results and idempotency records. Services get
+theirs from ``build_cache``, which picks the backend from
+``CACHE_BACKEND_URL``:
+
+- ``memory://`` (default) in-process LRU
+- ``sqlite:///cache.db`` / ``sqlite:////var/lib/eventpro/cache.db`` one
+  file shared by the workers of a single host
+- ``redis://[:password@]host:6379/0`` any Redis-protocol server
+
+Values stored in the out-of-process backends must be JSON-serializable and
+come back as fresh copies. Their errors are logged and treated as misses,
+so an unreachable cache slows requests down instead of failing them.
+
+Coroutines use the ``aget``/``aset``/``adelete``/``aget_many`` variants:
+the in-process cache answers inline, the others run their blocking I/O in
+a worker thread so a slow backend never stalls the event loop.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT = object()
+KEY_PREFIX = "eventpro"
+
+
+class AsyncCacheMixin:
+    """Async access for coroutines; ``blocking`` backends go through a thread."""
+
+    blocking = True
+
+    async def _offload(self, fn, *args):
+        if not self.blocking:
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    async def aget(self, key, default=None):
+        return await self._offload(self.get, key, default)
+
+    async def aset(self, key, value, ttl=_DEFAULT):
+        return await self._offload(self.set, key, value, ttl)
+
+    async def adelete(self, key):
+        return await self._offload(self.delete, key)
+
+    async def aget_many(self, keys) -> dict:
+        return await self._offload(self.get_many, keys)
+
+
+class TTLCache(AsyncCacheMixin):
+    """Size-bounded LRU cache whose entries expire after a per-entry TTL.
+
+    ``ttl=None`` stores an entry until it is evicted by size.
+    """
+
+    blocking = False
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self.clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=_DEFAULT):
+        ttl = self.ttl if ttl is _DEFAULT else ttl
+        expires_at = None if ttl is None else self.clock() + ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_many(self, keys) -> dict:
+        """Return the cached entries among ``keys``; misses are left out."""
+        found = {}
+        for key in keys:
+            value = self.get(key, _DEFAULT)
+            if value is not _DEFAULT:
+                found[key] = value
+        return found
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def close(self):
+        pass
+
+
+def _encode_key(key) -> str:
+    return key if isinstance(key, str) else json.dumps(key, separators=(",", ":"))
+
+
+class SQLiteCache(AsyncCacheMixin):
+    """``TTLCache`` stored in a SQLite file, shared by processes on one host.
+
+    Once a namespace outgrows ``maxsize`` its oldest-written entries are
+    evicted; reads do not refresh an entry's position. Each instance uses
+    one connection, serialized by a lock.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        maxsize: int = 1024,
+        ttl: float = None,
+        timeout: float = 1.0,
+        clock=time.time,
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timeout = timeout
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _execute(self, sql, params=()):
+        """Run one statement and return its rows; callers handle ``sqlite3.Error``."""
+        with self._lock:
+            if self._db is None:
+                db = sqlite3.connect(
+                    self.path, timeout=self.timeout, isolation_level=None,
+                    check_same_thread=False,
+                )
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=NORMAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                    " expires_at REAL, written_at REAL NOT NULL,"
+                    " PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+                )
+                db.execute(
+                    "CREATE INDEX IF NOT EXISTS cache_written ON cache (namespace, written_at)"
+                )
+                self._db = db
+            return self._db.execute(sql, params).fetchall()
+
+    def _failed(self, operation, error):
+        logger.warning(
+            f"Cache {operation} failed", extra={"backend": "sqlite", "error": str(error)}
+        )
+
+    def get(self, key, default=None):
+        try:
+            rows = self._execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ?"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (self.namespace, _encode_key(key), self.clock()),
+            )
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            rows = []
+        if not rows:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(rows[0][0])
+
+    def get_many(self, keys) -> dict:
+        keys = list(keys)
+        encoded = {_encode_key(key): key for key in keys}
+        found = {}
+        names = list(encoded)
+        try:
+            for chunk in range(0, len(names), 500):
+                batch = names[chunk : chunk + 500]
+                rows = self._execute(
+                    "SELECT key, value FROM cache WHERE namespace = ?"
+                    f" AND key IN ({','.join('?' * len(batch))})"
+                    " AND (expires_at IS NULL OR expires_at > ?)",
+                    (self.namespace, *batch, self.clock()),
+                )
+                for key, value in rows:
+                    found[encoded[key]] = json.loads(value)
+        except sqlite3.Error as e:
+            self._failed("read", e)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value, ttl=_DEFAULT):
+        ttl = self.ttl if ttl is _DEFAULT else ttl
+        now = self.clock()
+        try:
+            self._execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                (
+                    self.namespace,
+                    _encode_key(key),
+                    json.dumps(value),
+                    None if ttl is None else now + ttl,
+                    now,
+                ),
+            )
+            self._writes += 1
+            if self._writes % max(1, self.maxsize // 10) == 0:
+                self._evict(now)
+        except sqlite3.Error as e:
+            self._failed("write", e)
+
+    def _evict(self, now: float):
+        self._execute(
+            "DELETE FROM cache WHERE namespace = ? AND expires_at <= ?",
+            (self.namespace, now),
+        )
+        self._execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN ("
+            " SELECT key FROM cache WHERE namespace = ?"
+            " ORDER BY written_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.maxsize),
+        )
+
+    def delete(self, key):
+        try:
+            self._execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, _encode_key(key)),
+            )
+        except sqlite3.Error as e:
+            self._failed("write", e)
+
+    def clear(self):
+        try:
+            self._execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+        except sqlite3.Error as e:
+            self._failed("write", e)
+
+    def __len__(self):
+        try:
+            return self._execute(
+                "SELECT COUNT(*) FROM cache WHERE namespace = ?"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (self.namespace, self.clock()),
+            )[0][0]
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            return 0
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection:
+    """A blocking connection speaking the Redis protocol (RESP2)."""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    def command(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply {line!r}")
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+class RedisCache(AsyncCacheMixin):
+    """``TTLCache`` stored in Redis, shared by every worker and replica.
+
+    Entries expire through Redis TTLs; ``maxsize`` is left to the server's
+    ``maxmemory`` eviction policy. Connections are pooled per instance.
+    """
+
+    def __init__(self, url: str, namespace: str, ttl: float = None, timeout: float = 1.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.namespace = namespace
+        self.prefix = f"{KEY_PREFIX}:{namespace}:"
+        self.ttl = ttl
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._pool = queue.LifoQueue()
+
+    def _connect(self) -> RedisConnection:
+        conn = RedisConnection(self.host, self.port, self.timeout)
+        try:
+            if self.password:
+                conn.command("AUTH", self.password)
+            if self.db:
+                conn.command("SELECT", self.db)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def execute(self, *args):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            reply = conn.command(*args)
+        except RedisError:
+            self._pool.put(conn)  # an error reply leaves the connection usable
+            raise
+        except OSError:
+            conn.close()
+            raise
+        self._pool.put(conn)
+        return reply
+
+    def _key(self, key) -> str:
+        return self.prefix + _encode_key(key)
+
+    def get(self, key, default=None):
+        try:
+            data = self.execute("GET", self._key(key))
+        except (OSError, RedisError) as e:
+            logger.warning("Cache read failed", extra={"backend": "redis", "error": str(e)})
+            data = None
+        if data is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(data)
+
+    def get_many(self, keys) -> dict:
+        keys = list(keys)
+        found = {}
+        try:
+            for chunk in range(0, len(keys), 500):
+                batch = keys[chunk : chunk + 500]
+                values = self.execute("MGET", *(self._key(key) for key in batch))
+                found.update(
+                    (key, json.loads(value))
+                    for key, value in zip(batch, values)
+                    if value is not None
+                )
+        except (OSError, RedisError) as e:
+            logger.warning("Cache read failed", extra={"backend": "redis", "error": str(e)})
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value, ttl=_DEFAULT):
+        ttl = self.ttl if ttl is _DEFAULT else ttl
+        args = ["SET", self._key(key), json.dumps(value)]
+        if ttl is not None:
+            args += ["PX", max(1, int(ttl * 1000))]
+        try:
+            self.execute(*args)
+        except (OSError, RedisError) as e:
+            logger.warning("Cache write failed", extra={"backend": "redis", "error": str(e)})
+
+    def delete(self, key):
+        try:
+            self.execute("DEL", self._key(key))
+        except (OSError, RedisError) as e:
+            logger.warning("Cache write failed", extra={"backend": "redis", "error": str(e)})
+
+    def _scan(self):
+        cursor = b"0"
+        while True:
+            cursor, keys = self.execute("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 500)
+            yield from keys
+            if cursor == b"0":
+                return
+
+    def clear(self):
+        try:
+            keys = list(self._scan())
+            for i in range(0, len(keys), 500):
+                self.execute("DEL", *keys[i : i + 500])
+        except (OSError, RedisError) as e:
+            logger.warning("Cache write failed", extra={"backend": "redis", "error": str(e)})
+
+    def __len__(self):
+        try:
+            return sum(1 for _ in self._scan())
+        except (OSError, RedisError) as e:
+            logger.warning("Cache read failed", extra={"backend": "redis", "error": str(e)})
+            return 0
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def build_cache(namespace: str, maxsize: int = 1024, ttl: float = None):
+    """Create the cache for ``namespace`` on the ``CACHE_BACKEND_URL`` backend."""
+    url = os.getenv("CACHE_BACKEND_URL", "memory://")
+    timeout = float(os.getenv("CACHE_BACKEND_TIMEOUT", "1"))
+    scheme = url.split("://", 1)[0]
+
+    if scheme == "memory":
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    if scheme == "sqlite":
+        path = url[len("sqlite:///"):]
+        if not path:
+            raise ValueError("CACHE_BACKEND_URL must name a file, e.g. sqlite:///cache.db")
+        return SQLiteCache(path, namespace, maxsize=maxsize, ttl=ttl, timeout=timeout)
+    if scheme == "redis":
+        return RedisCache(url, namespace, ttl=ttl, timeout=timeout)
+    raise ValueError(f"Unsupported CACHE_BACKEND_URL scheme: {scheme}")
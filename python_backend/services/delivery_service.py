@@ -1,15 +1,30 @@
+import asyncio
 import os
 import json
 import time
 import hmac
+from datetime import datetime, timezone
 import hashlib
-import requests
+import httpx
+import logging
 import uuid
-from models.schemas import DeliveryCreate
+from typing import List
+from models.schemas import DeliveryCreate, QuotationCreate
+from services.cache import build_cache
+from services.rate_limiter import TokenBucket, retry_after_seconds
+from services.upstream import Upstream, deadline_scope
+
+logger = logging.getLogger(__name__)
+
+
+def quote_expires_in(expires_at: str, now: datetime = None) -> float:
+    """Seconds until a Lalamove ``expiresAt`` timestamp (ISO 8601, UTC)."""
+    expires = datetime.fromisoformat(expires_at.replace("Z", "+00:00"))
+    return (expires - (now or datetime.now(timezone.utc))).total_seconds()
 
 
 class DeliveryService:
-    def __init__(self):
+    def __init__(self, client: httpx.AsyncClient = None, upstream: Upstream = None):
         self.api_key = os.getenv("LALAMOVE_API_KEY")
         self.secret = os.getenv("LALAMOVE_SECRET")
         self.market = os.getenv("LALAMOVE_MARKET", "HK")  # Default to HK as in docs
@@ -20,15 +35,36 @@ class DeliveryService:
         if not self.api_key or not self.secret:
             raise RuntimeError("Missing Lalamove credentials in environment")
 
-    def _generate_auth_header(self, method: str, path: str, body: dict = None) -> str:
+        self.http = client or httpx.AsyncClient()
+        self.upstream = upstream or Upstream.from_env("lalamove")
+        # Every Lalamove call draws from one bucket; a 429 pauses it for the
+        # Retry-After period before the call is retried.
+        self.limiter = TokenBucket(
+            rate=float(os.getenv("LALAMOVE_RATE_LIMIT", "5")),
+            capacity=float(os.getenv("LALAMOVE_RATE_BURST", "10")),
+        )
+        self.rate_limit_retries = int(os.getenv("LALAMOVE_RATE_LIMIT_RETRIES", "3"))
+        self.bulk_concurrency = int(os.getenv("LALAMOVE_BULK_CONCURRENCY", "10"))
+        # Each order of a bulk booking gets its own deadline; paced by the
+        # limiter, the batch as a whole may run far longer than a request.
+        self.item_deadline = float(os.getenv("LALAMOVE_ITEM_DEADLINE", "30"))
+        # Quotes are cached per service type and route until Lalamove's
+        # validity ends. Rounding the coordinates (4 places is ~11 m) lets
+        # nearby pins at the same venue share a quote.
+        self.quote_precision = int(os.getenv("LALAMOVE_QUOTE_PRECISION", "4"))
+        self.quote_expiry_margin = float(os.getenv("LALAMOVE_QUOTE_EXPIRY_MARGIN", "30"))
+        self.quote_cache = build_cache(
+            "lalamove_quote",
+            maxsize=int(os.getenv("LALAMOVE_QUOTE_CACHE_SIZE", "1024")),
+        )
+
+    def close(self):
+        self.quote_cache.close()
+
+    def _generate_auth_header(self, method: str, path: str, body_str: str = "") -> str:
+        """Sign the exact bytes that go on the wire (empty for GET requests)."""
         timestamp = str(int(time.time() * 1000))
-        
-        # Handle empty body for GET requests
-        if body is None:
-            body_str = ""
-        else:
-            body_str = json.dumps(body, separators=(",", ":")) if body else ""
-        
+
         # Create signature according to Lalamove documentation
         raw_signature = f"{timestamp}\r\n{method}\r\n{path}\r\n\r\n{body_str}"
 
@@ -40,12 +76,105 @@ class DeliveryService:
 
         return f"hmac {self.api_key}:{timestamp}:{signature}"
 
-    def create_delivery(self, data: DeliveryCreate):
-        path = "/v3/orders"
-        
-        # Generate a unique Request-ID
+    async def _send(
+        self, method: str, path: str, body: dict, operation: str, idempotent: bool = False
+    ) -> httpx.Response:
+        """Send a signed request, waiting out 429 responses under the limiter.
+
+        Other transient failures are only retried for ``idempotent`` calls.
+        """
+        # Serialized once: the HMAC must cover exactly the bytes that are sent.
+        body_str = json.dumps(body, separators=(",", ":")) if body else ""
         request_id = str(uuid.uuid4())
-        
+
+        for attempt in range(self.rate_limit_retries + 1):
+            await self.limiter.acquire()
+            headers = {
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+                "Authorization": self._generate_auth_header(method, path, body_str),
+                "MARKET": self.market,
+                "Request-ID": request_id,
+            }
+            try:
+                response = await self.upstream.call(
+                    operation,
+                    lambda: self.http.request(
+                        method,
+                        self.base_url + path,
+                        content=body_str or None,
+                        headers=headers,
+                    ),
+                    idempotent=idempotent,
+                )
+            except httpx.HTTPError as e:
+                raise Exception(f"Network error: {str(e)}")
+
+            logger.debug(
+                "Lalamove request",
+                extra={
+                    "request_id": request_id,
+                    "operation": operation,
+                    "status": response.status_code,
+                    "attempt": attempt,
+                },
+            )
+            if response.status_code != 429 or attempt == self.rate_limit_retries:
+                return response
+
+            delay = retry_after_seconds(response.headers.get("Retry-After"), 2**attempt)
+            logger.warning(
+                "Lalamove rate limited",
+                extra={"request_id": request_id, "retry_after": delay},
+            )
+            self.limiter.pause(delay)
+
+    def quote_cache_key(self, data: QuotationCreate) -> tuple:
+        return (
+            data.serviceType,
+            tuple(
+                (round(stop.lat, self.quote_precision), round(stop.lng, self.quote_precision))
+                for stop in data.stops
+            ),
+        )
+
+    async def get_quotation(self, data: QuotationCreate) -> dict:
+        key = self.quote_cache_key(data)
+        cached = await self.quote_cache.aget(key)
+        if cached is not None:
+            return cached
+
+        path = "/v3/quotations"
+        body = {
+            "data": {
+                "serviceType": data.serviceType,
+                "language": "en_PH",
+                "stops": [
+                    {
+                        "coordinates": {"lat": str(stop.lat), "lng": str(stop.lng)},
+                        "address": stop.address,
+                    }
+                    for stop in data.stops
+                ],
+            }
+        }
+        response = await self._send(
+            "POST", path, body, "quotations.create", idempotent=True
+        )
+        if response.status_code >= 400:
+            raise Exception(f"Lalamove API Error {response.status_code}: {response.text}")
+
+        quotation = response.json()
+        expires_at = quotation.get("data", {}).get("expiresAt")
+        if expires_at:
+            ttl = quote_expires_in(expires_at) - self.quote_expiry_margin
+            if ttl > 0:
+                await self.quote_cache.aset(key, quotation, ttl)
+        return quotation
+
+    async def create_delivery(self, data: DeliveryCreate):
+        path = "/v3/orders"
+
         # Build the request body according to Lalamove API requirements
         body = {
             "serviceType": data.serviceType,
@@ -80,39 +209,29 @@ class DeliveryService:
         if data.remarks:
             body["specialRequests"] = [data.remarks]
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": self._generate_auth_header("POST", path, body),
-            "MARKET": self.market,  # Changed from X-LLM-Market to MARKET
-            "Request-ID": request_id,  # Added Request-ID as per documentation
-        }
+        response = await self._send("POST", path, body, "orders.create")
+        if response.status_code >= 400:
+            error_detail = f"Lalamove API Error {response.status_code}: {response.text}"
+            raise Exception(error_detail)
 
         try:
-            print(f"Making request to Lalamove API...")
-            print(f"Market: {self.market}")
-            print(f"Request-ID: {request_id}")
-            print(f"URL: {self.base_url + path}")
-            print(f"Headers: {headers}")
-            print(f"Body: {json.dumps(body, indent=2)}")
-            
-            response = requests.post(
-                self.base_url + path, 
-                json=body, 
-                headers=headers,
-                timeout=30
-            )
-            
-            print(f"Status Code: {response.status_code}")
-            print(f"Response Headers: {dict(response.headers)}")
-            print(f"Response: {response.text}")
-            
-            if response.status_code >= 400:
-                error_detail = f"Lalamove API Error {response.status_code}: {response.text}"
-                raise Exception(error_detail)
-                
             return response.json()
-            
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Network error: {str(e)}")
         except json.JSONDecodeError as e:
-            raise Exception(f"Invalid JSON response: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Invalid JSON response: {str(e)}")
+
+    async def create_deliveries(self, deliveries: List[DeliveryCreate]) -> list:
+        """Book every delivery concurrently and report success or failure per order."""
+        semaphore = asyncio.Semaphore(self.bulk_concurrency)
+
+        async def book(index, delivery):
+            async with semaphore:
+                try:
+                    with deadline_scope(self.item_deadline, replace=True):
+                        data = await self.create_delivery(delivery)
+                except Exception as e:
+                    return {"index": index, "success": False, "error": str(e)}
+            return {"index": index, "success": True, "data": data}
+
+        return await asyncio.gather(
+            *(book(index, delivery) for index, delivery in enumerate(deliveries))
+        )
@@ -1,30 +1,148 @@
-import google.generativeai as genai
+import asyncio
+import hashlib
+import json
+import logging
 import os
-from typing import List
+from typing import AsyncIterator, List
 from models.schemas import Supplier
-from dotenv import load_dotenv
+from services.cache import build_cache
+from services.upstream import Upstream
+from services.single_flight import SingleFlight
+from services.supplier_ranker import rank_suppliers
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+def recommendation_cache_key(
+    user_prompt: str, suppliers: List[Supplier], scope: str = None
+) -> str:
+    """Hash the prompt (case/whitespace-insensitive) and the supplier set (order-insensitive).
+
+    A ``scope`` (e.g. a catalog version) stands in for the supplier set when
+    the caller already knows which set it is.
+    """
+    normalized_prompt = " ".join(user_prompt.lower().split())
+    if scope is not None:
+        supplier_set = scope
+    else:
+        supplier_set = sorted(
+            (s.name, s.category, s.avg_rating, s.reviews) for s in suppliers
+        )
+    payload = json.dumps([normalized_prompt, supplier_set], separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 
 class GeminiService:
 
-    def __init__(self):
+    def __init__(self, upstream: Upstream = None):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise RuntimeError("Missing GEMINI_API_KEY in environment")
+        # The SDK takes about a second to import; only pay for it on first use.
+        import google.generativeai as genai
+
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel("gemini-2.0-flash")
+        self.cache = build_cache(
+            "gemini",
+            maxsize=int(os.getenv("GEMINI_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("GEMINI_CACHE_TTL", "600")),
+        )
+        # Only the best local matches are sent to the model.
+        self.top_k = int(os.getenv("GEMINI_TOP_K", "10"))
+        self.inflight = SingleFlight()
+        self.upstream = upstream or Upstream.from_env("gemini")
 
-    def get_recommendations(self, user_prompt: str, suppliers: List[Supplier]) -> dict:
+    async def get_recommendations(
+        self, user_prompt: str, suppliers: List[Supplier], cache_scope: str = None
+    ) -> str:
+        key = recommendation_cache_key(user_prompt, suppliers, cache_scope)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            return cached
+
+        # Identical requests arriving together share one Gemini call.
+        return await self.inflight.do(
+            key, lambda: self._generate(key, user_prompt, suppliers)
+        )
+
+    async def _generate(self, key: str, user_prompt: str, suppliers: List[Supplier]) -> str:
+        logger.debug("Ranking suppliers", extra={"suppliers": len(suppliers)})
+
+        prompt = await asyncio.to_thread(self.build_prompt, user_prompt, suppliers)
+        response = await self.upstream.call(
+            "generate", lambda: self.model.generate_content_async(prompt), idempotent=True
+        )
+        await self.cache.aset(key, response.text)
+        return response.text
+
+    async def stream_recommendations(
+        self, user_prompt: str, suppliers: List[Supplier], cache_scope: str = None
+    ) -> AsyncIterator[str]:
+        """Yield each recommendation line as soon as the model finishes it.
+
+        The upstream stream is read by a separate task that is cancelled when
+        this generator is closed or cancelled (e.g. the client disconnects),
+        which cancels the Gemini call and stops token spend.
+        """
+        key = recommendation_cache_key(user_prompt, suppliers, cache_scope)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            for line in cached.splitlines():
+                if line.strip():
+                    yield line
+            return
+
+        prompt = await asyncio.to_thread(self.build_prompt, user_prompt, suppliers)
+        chunks = asyncio.Queue()
+
+        async def read_stream():
+            try:
+                # Only opening the stream is bounded; chunks keep flowing for
+                # as long as the client stays connected.
+                response = await self.upstream.call(
+                    "stream",
+                    lambda: self.model.generate_content_async(prompt, stream=True),
+                )
+                async for chunk in response:
+                    await chunks.put(chunk.text)
+                await chunks.put(None)
+            except Exception as e:
+                await chunks.put(e)
+
+        reader = asyncio.create_task(read_stream())
+        text, buffer = [], ""
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+
+                text.append(chunk)
+                *lines, buffer = (buffer + chunk).split("\n")
+                for line in lines:
+                    if line.strip():
+                        yield line
+        finally:
+            reader.cancel()
+
+        if buffer.strip():
+            yield buffer
+        await self.cache.aset(key, "".join(text))
+
+    def close(self):
+        self.cache.close()
+
+    def build_prompt(self, user_prompt: str, suppliers: List[Supplier]) -> str:
+        candidates = rank_suppliers(user_prompt, suppliers, self.top_k)
         suppliers_text = "\n".join(
             f"{s.name} ({s.category}): {s.avg_rating}/5 – {s.reviews}"
-            for s in suppliers
+            for s in candidates
         )
 
-        print(suppliers)
-
-        prompt = f"""`
+        return f"""`
             You are an intelligent assistant that recommends suppliers to event planners. Speak naturally like a human.
 
             User wants: {user_prompt}
@@ -44,5 +162,3 @@ class GeminiService:
             3: <Supplier Name> – short explanation
 
             """.strip()
-        response = self.model.generate_content(prompt)
-        return response.text
@@ -0,0 +1,38 @@
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.upstream import bounded_timeout
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """Applies a default timeout, cut to the request's remaining deadline.
+
+    SDKs such as xendit call ``session.request`` without a timeout, which
+    would otherwise let a stalled upstream hold a worker thread forever.
+    """
+
+    def __init__(self, timeout: float, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(
+            request, timeout=bounded_timeout(timeout or self.timeout), **kwargs
+        )
+
+
+def build_http_session() -> requests.Session:
+    """Create a keep-alive session shared by every outbound HTTP call."""
+    pool_size = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+    adapter = TimeoutHTTPAdapter(
+        timeout=float(os.getenv("HTTP_TIMEOUT", "30")),
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -0,0 +1,113 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class Progress:
+    """Counters a job updates from its worker thread while it is polled.
+
+    Every access goes through a lock, so pollers always see a consistent
+    copy even while the job is mid-update.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            self._data.update(fields)
+
+    def add(self, **amounts):
+        with self._lock:
+            for field, amount in amounts.items():
+                self._data[field] = self._data.get(field, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._data)
+
+
+class JobRunner:
+    """Runs background jobs one at a time and keeps their progress for polling.
+
+    Submitting while a job is queued or running returns the active job instead
+    of starting another, so repeated triggers never overlap.
+    """
+
+    def __init__(self, history: int = 50):
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._active = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, **params):
+        """Queue ``fn(progress, **params)``; returns ``(job, created)``.
+
+        ``progress`` is a ``Progress`` the job reports into as it runs.
+        """
+        with self._lock:
+            if self._active and self._active["status"] in ACTIVE_STATUSES:
+                return self._snapshot(self._active), False
+
+            job = {
+                "id": uuid.uuid4().hex,
+                "status": "queued",
+                "params": params,
+                "progress": Progress(),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "duration_seconds": None,
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job["id"]] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+            self._active = job
+            self._executor.submit(self._run, job, fn, params)
+            return self._snapshot(job), True
+
+    def _run(self, job, fn, params):
+        started = time.monotonic()
+        with self._lock:
+            job["status"] = "running"
+            job["started_at"] = datetime.now(timezone.utc).isoformat()
+
+        try:
+            result = fn(job["progress"], **params)
+            status, error = "succeeded", None
+        except Exception as e:
+            result, status, error = None, "failed", str(e)
+
+        with self._lock:
+            job["status"] = status
+            job["result"] = result
+            job["error"] = error
+            job["finished_at"] = datetime.now(timezone.utc).isoformat()
+            job["duration_seconds"] = round(time.monotonic() - started, 3)
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def _snapshot(self, job):
+        snapshot = dict(job)
+        snapshot["progress"] = job["progress"].snapshot()
+        if job["status"] == "running":
+            snapshot["duration_seconds"] = round(
+                (datetime.now(timezone.utc) - datetime.fromisoformat(job["started_at"])).total_seconds(),
+                3,
+            )
+        return snapshot
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
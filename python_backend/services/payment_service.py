@@ -1,31 +1,81 @@
-from xendit import Xendit
+import hmac
 from models.schemas import EventCredential
+from services.cache import build_cache
+from services.upstream import Upstream
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+TERMINAL_INVOICE_STATUSES = {"PAID", "SETTLED", "EXPIRED"}
 
 
 class PaymentService:
-    def __init__(self):
+    def __init__(self, session=None, upstream: Upstream = None):
+        """``session`` is a ``requests.Session``; bare ``requests`` by default."""
         api_key = os.getenv("XENDIT_SECRET_KEY")
         if not api_key:
             raise RuntimeError("Missing XENDIT_SECRET_KEY in environment")
-        self.xendit = Xendit(api_key=api_key)
+        import requests
+        from xendit import Xendit
+
+        self.xendit = Xendit(api_key=api_key, http_client=session or requests)
+        self.callback_token = os.getenv("XENDIT_CALLBACK_TOKEN")
+        self.upstream = upstream or Upstream.from_env("xendit")
+        # Invoice id -> status, fed by the invoice webhook. Pending entries go
+        # stale so a missed callback still falls back to Xendit.
+        self.status_store = build_cache(
+            "payment_status",
+            maxsize=int(os.getenv("PAYMENT_STATUS_STORE_SIZE", "10000")),
+            ttl=float(os.getenv("PAYMENT_PENDING_STATUS_TTL", "30")),
+        )
 
     def create_invoice(self, credential: EventCredential):
-        return self.xendit.Invoice.create(
-            external_id=credential.external_id,
-            payer_email=credential.payer_email,
-            description="required",
-            amount=credential.net_amount,
-            currency="PHP",
-            invoice_duration=30,
-            success_redirect_url="https://unite-eventpro.site/payment/success?id="
-            + credential.external_id,
-            failure_redirect_url="https://unite-eventpro.site/failed_payment",
-            payment_methods=[credential.payment_method],
+        # Not retried: Xendit does not deduplicate invoices by external_id.
+        invoice = self.upstream.call_sync(
+            "invoice.create",
+            lambda: self.xendit.Invoice.create(
+                external_id=credential.external_id,
+                payer_email=credential.payer_email,
+                description="required",
+                amount=credential.net_amount,
+                currency="PHP",
+                invoice_duration=30,
+                success_redirect_url="https://unite-eventpro.site/payment/success?id="
+                + credential.external_id,
+                failure_redirect_url="https://unite-eventpro.site/failed_payment",
+                payment_methods=[credential.payment_method],
+            ),
         )
+        self.record_status(invoice.id, invoice.status)
+        return invoice
 
     def check_status(self, invoice_id: str):
-        return self.xendit.Invoice.get(invoice_id=invoice_id)
+        return self.upstream.call_sync(
+            "invoice.get",
+            lambda: self.xendit.Invoice.get(invoice_id=invoice_id),
+            idempotent=True,
+        )
+
+    def record_status(self, invoice_id: str, status: str):
+        current = self.status_store.get(invoice_id)
+        if current in TERMINAL_INVOICE_STATUSES and status not in TERMINAL_INVOICE_STATUSES:
+            return  # a late PENDING callback must not undo a final status
+
+        if status in TERMINAL_INVOICE_STATUSES:
+            self.status_store.set(invoice_id, status, ttl=None)
+        else:
+            self.status_store.set(invoice_id, status)
+
+    def get_status(self, invoice_id: str) -> str:
+        """Answer from the webhook-fed store, fetching from Xendit on a miss."""
+        status = self.status_store.get(invoice_id)
+        if status is None:
+            status = self.check_status(invoice_id).status
+            self.record_status(invoice_id, status)
+        return status
+
+    def close(self):
+        self.status_store.close()
+
+    def verify_callback_token(self, token: str) -> bool:
+        if not self.callback_token or not token:
+            return False
+        return hmac.compare_digest(self.callback_token, token)
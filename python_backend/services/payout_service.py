@@ -1,24 +1,72 @@
-import requests
-from requests.auth import HTTPBasicAuth
-from dotenv import load_dotenv
+import asyncio
+import hashlib
+import httpx
+import json
+from typing import AsyncIterator, List
 from models.schemas import PayoutCredential
+from services.cache import build_cache
+from services.rate_limiter import TokenBucket
+from services.reconciler import StatusReconciler
+from services.single_flight import SingleFlight
+from services.upstream import Upstream, deadline_scope, error_body
 import os
 import uuid
 
-load_dotenv()
+TERMINAL_PAYOUT_STATUSES = {"SUCCEEDED", "FAILED", "CANCELLED", "REVERSED"}
+
+
+def payout_idempotency_key(reference_id: str) -> str:
+    """Same reference_id always maps to the same key, so retries never double-pay."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"eventpro:payout:{reference_id}"))
+
+
+def payout_fingerprint(data: dict) -> str:
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _error_detail(error: Exception):
+    if error.args and isinstance(error.args[0], (dict, str)):
+        return error.args[0]
+    return str(error)
 
 
 class PayoutService:
 
-    def __init__(self):
+    def __init__(self, client: httpx.AsyncClient = None, upstream: Upstream = None):
         api_key = os.getenv("XENDIT_SECRET_KEY")
         if not api_key:
             raise RuntimeError("Missing XENDIT_SECRET_KEY in environment")
-        self.auth = HTTPBasicAuth(api_key, "")
+        self.auth = httpx.BasicAuth(api_key, "")
+        self.base_url = os.getenv("XENDIT_BASE_URL", "https://api.xendit.co")
+        self.http = client or httpx.AsyncClient()
+        self.upstream = upstream or Upstream.from_env("xendit")
+        # reference_id -> recorded Xendit response, replayed for repeated
+        # requests instead of calling Xendit again. Shared between workers
+        # when CACHE_BACKEND_URL points outside the process.
+        self.idempotency_store = build_cache(
+            "payout_idempotency",
+            maxsize=int(os.getenv("PAYOUT_IDEMPOTENCY_STORE_SIZE", "10000")),
+            ttl=float(os.getenv("PAYOUT_IDEMPOTENCY_TTL", "86400")),
+        )
+        self.inflight = SingleFlight()
+        self.batch_max = int(os.getenv("PAYOUT_BATCH_MAX", "1000"))
+        self.batch_concurrency = int(os.getenv("PAYOUT_BATCH_CONCURRENCY", "10"))
+        # Each item of a batch gets its own deadline; the batch as a whole
+        # may run far longer than a single request.
+        self.item_deadline = float(os.getenv("PAYOUT_ITEM_DEADLINE", "30"))
+        self.channel_rate = float(os.getenv("PAYOUT_CHANNEL_RATE", "5"))
+        self.channel_limiters = {}
+        # Payouts still in progress are polled in the background; status
+        # reads are answered from its store.
+        self.reconciler = StatusReconciler(
+            "payout",
+            self._fetch_status,
+            lambda payout: payout.get("status") in TERMINAL_PAYOUT_STATUSES,
+        )
 
-    def create_payout(self, bank: PayoutCredential) -> dict:
-        url = "https://api.xendit.co/v2/payouts"
-        data = {
+    def payout_body(self, bank: PayoutCredential) -> dict:
+        return {
             "reference_id": bank.reference_id,
             "amount": bank.amount,
             "currency": "PHP",
@@ -30,18 +78,148 @@ class PayoutService:
             "description": "Withdrawal to bank",
         }
 
-        headers = {"idempotency-key": str(uuid.uuid4())}
+    async def create_payout(self, bank: PayoutCredential) -> dict:
+        """Create the payout once per reference_id and replay the recorded response.
+
+        Concurrent requests for the same reference_id share one Xendit call.
+        Reusing a reference_id with different payout details is rejected.
+        """
+        data = self.payout_body(bank)
+        fingerprint = payout_fingerprint(data)
+
+        recorded = await self.idempotency_store.aget(bank.reference_id)
+        if recorded is None:
+            recorded = await self.inflight.do(
+                bank.reference_id, lambda: self._submit_payout(data, fingerprint)
+            )
+
+        if recorded["fingerprint"] != fingerprint:
+            raise Exception(
+                {
+                    "error_code": "IDEMPOTENCY_CONFLICT",
+                    "message": f"reference_id {bank.reference_id} was already used "
+                    "for a payout with different details",
+                }
+            )
+        return recorded["response"]
+
+    async def _submit_payout(self, data: dict, fingerprint: str) -> dict:
+        url = f"{self.base_url}/v2/payouts"
+        headers = {"idempotency-key": payout_idempotency_key(data["reference_id"])}
 
-        response = requests.post(url, json=data, auth=self.auth, headers=headers)
+        # Retries reuse the idempotency key, so Xendit pays out at most once.
+        response = await self.upstream.call(
+            "payout.create",
+            lambda: self.http.post(url, json=data, auth=self.auth, headers=headers),
+            idempotent=True,
+        )
 
         if response.status_code != 200:
-            raise Exception(response.json())
+            raise Exception(error_body(response))
 
-        return response.json()
+        payout = response.json()
+        recorded = {"fingerprint": fingerprint, "response": payout}
+        await self.idempotency_store.aset(data["reference_id"], recorded)
+        if payout.get("id"):
+            await self.reconciler.track(payout["id"], payout)
+        return recorded
+
+    async def validate_batch(self, payouts: List[PayoutCredential]) -> list:
+        """Return every problem in the batch; an empty list means it can run."""
+        if not payouts:
+            return [{"error": "Batch contains no payouts"}]
+        if len(payouts) > self.batch_max:
+            return [{"error": f"Batch exceeds {self.batch_max} payouts"}]
+
+        # One round trip for the whole batch rather than one per payout.
+        recorded_by_ref = await self.idempotency_store.aget_many(
+            {bank.reference_id for bank in payouts}
+        )
+        errors, seen = [], set()
+        for index, bank in enumerate(payouts):
+            problem = None
+            if bank.reference_id in seen:
+                problem = "Duplicate reference_id in batch"
+            elif bank.amount <= 0:
+                problem = "Amount must be positive"
+            elif not all(
+                value.strip()
+                for value in (
+                    bank.reference_id,
+                    bank.channel_code,
+                    bank.account_number,
+                    bank.account_holder_name,
+                )
+            ):
+                problem = "reference_id, channel and account details are required"
+            else:
+                recorded = recorded_by_ref.get(bank.reference_id)
+                fingerprint = payout_fingerprint(self.payout_body(bank))
+                if recorded is not None and recorded["fingerprint"] != fingerprint:
+                    problem = "reference_id was already used with different details"
+            seen.add(bank.reference_id)
+
+            if problem:
+                errors.append(
+                    {"index": index, "reference_id": bank.reference_id, "error": problem}
+                )
+        return errors
+
+    def _channel_limiter(self, channel_code: str) -> TokenBucket:
+        limiter = self.channel_limiters.get(channel_code)
+        if limiter is None:
+            limiter = self.channel_limiters[channel_code] = TokenBucket(self.channel_rate)
+        return limiter
 
-    def check_status(self, payout_id: str) -> dict:
+    async def create_payouts(
+        self, payouts: List[PayoutCredential]
+    ) -> AsyncIterator[dict]:
+        """Run a validated batch, yielding each item's result as it completes.
 
-        url = f"https://api.xendit.co/v2/payouts/{payout_id}"
-        response = requests.get(url, auth=self.auth)
+        Payouts already recorded for their reference_id are replayed without
+        calling Xendit, so re-sending a partially finished batch resumes it.
+        Closing the generator cancels the items that have not finished.
+        """
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
 
+        async def settle(bank):
+            replayed = await self.idempotency_store.aget(bank.reference_id) is not None
+            result = {"reference_id": bank.reference_id, "replayed": replayed}
+            async with semaphore:
+                try:
+                    if not replayed:
+                        await self._channel_limiter(bank.channel_code).acquire()
+                    with deadline_scope(self.item_deadline, replace=True):
+                        data = await self.create_payout(bank)
+                except Exception as e:
+                    return {**result, "success": False, "error": _error_detail(e)}
+            return {**result, "success": True, "data": data}
+
+        tasks = [asyncio.ensure_future(settle(bank)) for bank in payouts]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                yield await completed
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _fetch_status(self, payout_id: str) -> dict:
+        url = f"{self.base_url}/v2/payouts/{payout_id}"
+        response = await self.upstream.call(
+            "payout.get", lambda: self.http.get(url, auth=self.auth), idempotent=True
+        )
+        if response.status_code != 200:
+            raise Exception(error_body(response))
         return response.json()
+
+    async def check_status(self, payout_id: str) -> dict:
+        """Answer from the reconciler, fetching from Xendit only for unknown ids."""
+        payout = await self.reconciler.get(payout_id)
+        if payout is None:
+            payout = await self._fetch_status(payout_id)
+            await self.reconciler.track(payout_id, payout)
+        return payout
+
+    def close(self):
+        self.idempotency_store.close()
+        self.reconciler.close()
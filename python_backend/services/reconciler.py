@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+import random
+import time
+
+from services.cache import build_cache
+from services.upstream import deadline_scope
+
+logger = logging.getLogger(__name__)
+
+
+class StatusReconciler:
+    """Keeps the latest upstream status of tracked ids, polling pending ones.
+
+    ``fetch(id)`` returns the upstream record and ``is_terminal(record)``
+    says whether it can still change. Each pending id is re-polled with its
+    own exponential backoff and dropped from polling once terminal, so
+    upstream traffic follows the number of pending items rather than how
+    often clients ask. Clients await ``get(id)``, which never calls upstream.
+
+    The polling task starts with the first ``track`` made on an event loop.
+
+    With a shared cache backend every worker reads the same statuses, while
+    each polls only the ids it tracks. Pending records expire unless polls
+    keep refreshing them, so ids orphaned by a restarted worker fall back
+    to a live fetch.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch,
+        is_terminal,
+        batch_size: int = None,
+        base_delay: float = None,
+        max_delay: float = None,
+        max_age: float = None,
+        interval: float = None,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.fetch = fetch
+        self.is_terminal = is_terminal
+        self.batch_size = batch_size or int(os.getenv("RECONCILE_BATCH_SIZE", "50"))
+        self.base_delay = base_delay or float(os.getenv("RECONCILE_BASE_DELAY", "5"))
+        self.max_delay = max_delay or float(os.getenv("RECONCILE_MAX_DELAY", "300"))
+        # Items that stay pending this long are dropped; the next client read
+        # fetches them live and starts tracking again.
+        self.max_age = max_age or float(os.getenv("RECONCILE_MAX_AGE", "86400"))
+        self.interval = interval or float(os.getenv("RECONCILE_INTERVAL", "1"))
+        # Polls run outside any request, so each gets a budget of its own.
+        self.poll_deadline = float(os.getenv("RECONCILE_POLL_DEADLINE", "30"))
+        self.pending_ttl = 2 * self.max_delay
+        self.statuses = build_cache(
+            f"{name}_status", maxsize=int(os.getenv("RECONCILE_STORE_SIZE", "10000"))
+        )
+        self._pending = {}  # id -> (next poll time, attempts, tracked since)
+        self._clock = clock
+        self._task = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def get(self, item_id: str):
+        return await self.statuses.aget(item_id)
+
+    async def _store(self, item_id: str, record: dict) -> bool:
+        """Save ``record``; returns True if it is terminal."""
+        terminal = self.is_terminal(record)
+        await self.statuses.aset(
+            item_id, record, None if terminal else self.pending_ttl
+        )
+        return terminal
+
+    async def track(self, item_id: str, record: dict = None):
+        """Record what is known about ``item_id`` and poll it until terminal."""
+        if record is not None and await self._store(item_id, record):
+            self._pending.pop(item_id, None)
+            return
+
+        if item_id not in self._pending:
+            now = self._clock()
+            first_poll = now + (self.base_delay if record is not None else 0)
+            self._pending[item_id] = (first_poll, 0, now)
+        self._ensure_running()
+
+    def close(self):
+        self.statuses.close()
+
+    def _ensure_running(self):
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        except RuntimeError:
+            pass  # no loop yet; polling starts with the next track on one
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2**attempts)
+        return delay * random.uniform(0.75, 1.0)
+
+    async def _poll(self, item_id: str, attempts: int, since: float):
+        try:
+            with deadline_scope(self.poll_deadline, replace=True):
+                record = await self.fetch(item_id)
+        except Exception as e:
+            logger.warning(
+                "Status poll failed",
+                extra={"reconciler": self.name, "id": item_id, "error": str(e)},
+            )
+            record = None
+
+        now = self._clock()
+        if record is not None and await self._store(item_id, record):
+            self._pending.pop(item_id, None)
+            return
+
+        if now - since > self.max_age:
+            self._pending.pop(item_id, None)
+            await self.statuses.adelete(item_id)
+            return
+        if item_id in self._pending:
+            self._pending[item_id] = (now + self._backoff(attempts), attempts + 1, since)
+
+    async def poll_due(self) -> int:
+        """Poll up to ``batch_size`` items that are due; returns how many."""
+        now = self._clock()
+        due = sorted(
+            (next_poll, item_id, attempts, since)
+            for item_id, (next_poll, attempts, since) in self._pending.items()
+            if next_poll <= now
+        )[: self.batch_size]
+
+        await asyncio.gather(
+            *(self._poll(item_id, attempts, since) for _, item_id, attempts, since in due)
+        )
+        return len(due)
+
+    async def _run(self):
+        while self._pending:
+            await self.poll_due()
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
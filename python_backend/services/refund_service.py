@@ -1,47 +1,105 @@
-import requests
-from xendit import Xendit
-from requests.auth import HTTPBasicAuth
-from dotenv import load_dotenv
-from models.schemas import RefundRequest
+import asyncio
+import httpx
+from models.schemas import RefundCredential, RefundRequest
+from services.reconciler import StatusReconciler
+from services.upstream import Upstream, UpstreamUnavailable, error_body
 import os
 import uuid
 
-load_dotenv()
+TERMINAL_REFUND_STATUSES = {"SUCCEEDED", "FAILED", "CANCELLED"}
+
+
+def refund_idempotency_key(reference_id: str) -> str:
+    """Same reference_id always maps to the same key, so retries never double-refund."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"eventpro:refund:{reference_id}"))
 
 
 class RefundService:
-    def __init__(self):
+    def __init__(self, client: httpx.AsyncClient = None, upstream: Upstream = None):
         api_key = os.getenv("XENDIT_SECRET_KEY")
         if not api_key:
             raise RuntimeError("Missing XENDIT_SECRET_KEY in environment")
-        self.auth = HTTPBasicAuth(api_key, "")
-
-    def create_refund(self, credential: RefundRequest) -> list:
-        url = "https://api.xendit.co/refunds"
-        refunds = []
-        for refund in credential.refund:
-            data = {
-                "reference_id": refund.reference_id,
-                "amount": refund.amount,
-                "currency": "PHP",
-                "invoice_id": refund.invoice_id,
-            }
-            response = requests.post(url, json=data, auth=self.auth)
-            if response.status_code != 200:
-                raise Exception(response.json())
-            refunds.append(response.json())
-
-        return refunds
-
-    def get_refund_status(self, refund_id: str) -> dict:
-        url = f"https://api.xendit.co/refunds/{refund_id}"
-        response = requests.get(url, auth=self.auth)
+        self.auth = httpx.BasicAuth(api_key, "")
+        self.base_url = os.getenv("XENDIT_BASE_URL", "https://api.xendit.co")
+        self.http = client or httpx.AsyncClient()
+        self.upstream = upstream or Upstream.from_env("xendit")
+        self.concurrency = int(os.getenv("XENDIT_REFUND_CONCURRENCY", "10"))
+        # Pending refunds are polled in the background; status reads are
+        # answered from its store.
+        self.reconciler = StatusReconciler(
+            "refund",
+            self._fetch_refund,
+            lambda refund: refund.get("status") in TERMINAL_REFUND_STATUSES,
+        )
+
+    async def _create_single_refund(
+        self, refund: RefundCredential, semaphore: asyncio.Semaphore
+    ) -> dict:
+        url = f"{self.base_url}/refunds"
+        data = {
+            "reference_id": refund.reference_id,
+            "amount": refund.amount,
+            "currency": "PHP",
+            "invoice_id": refund.invoice_id,
+        }
+        headers = {"idempotency-key": refund_idempotency_key(refund.reference_id)}
+        result = {"reference_id": refund.reference_id}
+
+        async with semaphore:
+            try:
+                response = await self.upstream.call(
+                    "refund.create",
+                    lambda: self.http.post(
+                        url, json=data, auth=self.auth, headers=headers
+                    ),
+                    idempotent=True,
+                )
+            except (httpx.HTTPError, UpstreamUnavailable) as e:
+                return {**result, "success": False, "error": str(e)}
+
+        if response.status_code != 200:
+            return {**result, "success": False, "error": error_body(response)}
+
+        refund = response.json()
+        if refund.get("id"):
+            await self.reconciler.track(refund["id"], refund)
+        return {**result, "success": True, "data": refund}
+
+    async def create_refund(self, credential: RefundRequest) -> list:
+        """Refund every item concurrently and report success or failure per item."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(
+            *(
+                self._create_single_refund(refund, semaphore)
+                for refund in credential.refund
+            )
+        )
+
+    async def _fetch_refund(self, refund_id: str) -> dict:
+        url = f"{self.base_url}/refunds/{refund_id}"
+        response = await self.upstream.call(
+            "refund.get", lambda: self.http.get(url, auth=self.auth), idempotent=True
+        )
         if response.status_code != 200:
             raise Exception(response.json())
         return response.json()
 
-    def get_multiple_refunds(self, refund_ids: list) -> list:
-        results = []
-        for rid in refund_ids:
-            results.append(self.get_refund_status(rid))
-        return results
+    async def get_refund_status(self, refund_id: str) -> dict:
+        """Answer from the reconciler, fetching from Xendit only for unknown ids."""
+        refund = await self.reconciler.get(refund_id)
+        if refund is None:
+            refund = await self._fetch_refund(refund_id)
+            await self.reconciler.track(refund_id, refund)
+        return refund
+
+    def close(self):
+        self.reconciler.close()
+
+    async def get_multiple_refunds(self, refund_ids: list) -> list:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(refund_id):
+            async with semaphore:
+                return await self.get_refund_status(refund_id)
+
+        return await asyncio.gather(*(fetch(rid) for rid in refund_ids))
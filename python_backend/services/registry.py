@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+
+import httpx
+
+from services.gemini_service import GeminiService
+from services.payment_service import PaymentService
+from services.payout_service import PayoutService
+from services.refund_service import RefundService
+from services.delivery_service import DeliveryService
+from services.job_runner import JobRunner
+from services.supplier_catalog import SupplierCatalog
+from services.upstream import Upstream
+
+logger = logging.getLogger(__name__)
+
+
+def build_async_client() -> httpx.AsyncClient:
+    """Create the pooled async client used for Xendit payout and refund calls."""
+    timeout = httpx.Timeout(
+        float(os.getenv("XENDIT_TIMEOUT", "30")),
+        connect=float(os.getenv("XENDIT_CONNECT_TIMEOUT", "5")),
+    )
+    max_connections = int(os.getenv("XENDIT_MAX_CONNECTIONS", "100"))
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+    )
+    return httpx.AsyncClient(timeout=timeout, limits=limits)
+
+
+class ServiceRegistry:
+    """Builds each service once per app lifespan and shares its connection pool.
+
+    Services are created on first use so a missing credential only breaks the
+    routes that need it, the same as when services were built per request.
+    Heavy SDKs (google-generativeai, firestore, xendit, requests) are
+    imported by the service that needs them, so they load on first use too.
+    """
+
+    def __init__(self):
+        self.async_http = build_async_client()
+        # One policy (and circuit breaker) per upstream, shared by its services.
+        self.upstreams = {
+            name: Upstream.from_env(name) for name in ("xendit", "lalamove", "gemini")
+        }
+        self.jobs = JobRunner()
+        self._services = {}
+        # Reentrant: a factory may build the services it depends on.
+        self._lock = threading.RLock()
+
+    def _get(self, name, factory):
+        service = self._services.get(name)
+        if service is None:
+            with self._lock:
+                service = self._services.get(name)
+                if service is None:
+                    service = factory()
+                    self._services[name] = service
+        return service
+
+    def warm_up(self, names):
+        """Build the named services ahead of their first request."""
+        for name in names:
+            try:
+                getattr(self, name)
+            except Exception as e:
+                logger.warning(
+                    "Warm-up failed", extra={"service": name, "error": str(e)}
+                )
+
+    @property
+    def http(self):
+        from services.http_session import build_http_session
+
+        return self._get("http", build_http_session)
+
+    @property
+    def firestore(self):
+        from services.auto_cancel_service import build_firestore_client
+
+        return self._get("firestore", build_firestore_client)
+
+    @property
+    def supplier_catalog(self) -> SupplierCatalog:
+        # Built before the catalog's factory runs, not from inside it while
+        # the registry lock is held.
+        db = self.firestore
+
+        def start_catalog():
+            catalog = SupplierCatalog(db)
+            catalog.start()
+            return catalog
+
+        return self._get("supplier_catalog", start_catalog)
+
+    @property
+    def gemini(self) -> GeminiService:
+        return self._get(
+            "gemini", lambda: GeminiService(upstream=self.upstreams["gemini"])
+        )
+
+    @property
+    def payment(self) -> PaymentService:
+        return self._get(
+            "payment",
+            lambda: PaymentService(session=self.http, upstream=self.upstreams["xendit"]),
+        )
+
+    @property
+    def payout(self) -> PayoutService:
+        return self._get(
+            "payout",
+            lambda: PayoutService(client=self.async_http, upstream=self.upstreams["xendit"]),
+        )
+
+    @property
+    def refund(self) -> RefundService:
+        return self._get(
+            "refund",
+            lambda: RefundService(client=self.async_http, upstream=self.upstreams["xendit"]),
+        )
+
+    @property
+    def delivery(self) -> DeliveryService:
+        return self._get(
+            "delivery",
+            lambda: DeliveryService(client=self.async_http, upstream=self.upstreams["lalamove"]),
+        )
+
+    async def aclose(self):
+        self.jobs.shutdown()
+        for name in ("payout", "refund"):
+            if name in self._services:
+                await self._services[name].reconciler.stop()
+        if "supplier_catalog" in self._services:
+            self._services["supplier_catalog"].stop()
+        # Closes the firestore client, the requests session and each
+        # service's cache connections.
+        for service in self._services.values():
+            close = getattr(service, "close", None)
+            if close is not None:
+                close()
+        self._services.clear()
+        await self.async_http.aclose()
@@ -0,0 +1,205 @@
+import logging
+import os
+import socket
+import string
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from google.api_core import exceptions
+
+from services.job_runner import Progress
+
+logger = logging.getLogger(__name__)
+
+# Firestore auto-ids use these characters; the list is in byte order.
+SHARD_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+LEASE_COLLECTION = "sweep_leases"
+
+
+def shard_ranges(count: int) -> list:
+    """Split the document-id keyspace into ``count`` contiguous ``[start, end)`` ranges.
+
+    The first range is open at the bottom and the last at the top, so ids
+    outside the auto-id alphabet still land in exactly one shard.
+    """
+    count = max(1, min(count, len(SHARD_ALPHABET)))
+    step = len(SHARD_ALPHABET) / count
+    starts = [None] + [SHARD_ALPHABET[round(i * step)] for i in range(1, count)]
+    ends = starts[1:] + [None]
+    return list(zip(starts, ends))
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class Lease:
+    def __init__(self, reference, run_id, shard, owner, update_time):
+        self.reference = reference
+        self.run_id = run_id
+        self.shard = shard
+        self.owner = owner
+        self.update_time = update_time
+
+
+class ShardLeases:
+    """Claims sweep shards through lease documents with an expiry.
+
+    Claims and renewals are conditional writes: a new lease uses ``create``
+    and taking over an expired one is guarded by the document's last update
+    time, so two workers can never both win the same shard.
+    """
+
+    def __init__(self, db, owner: str = None, ttl: float = None):
+        self.db = db
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.ttl = ttl if ttl is not None else float(os.getenv("AUTO_CANCEL_LEASE_TTL", "300"))
+
+    def _reference(self, run_id, shard):
+        return self.db.collection(LEASE_COLLECTION).document(f"{run_id}:{shard}")
+
+    def _lease_data(self, run_id, shard):
+        return {
+            "run_id": run_id,
+            "shard": shard,
+            "owner": self.owner,
+            "status": "leased",
+            "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl),
+        }
+
+    def claim(self, run_id, shard):
+        """Try to lease a shard; returns ``(state, lease)``.
+
+        ``state`` is ``"claimed"``, ``"held"`` (another live owner) or
+        ``"done"``.
+        """
+        reference = self._reference(run_id, shard)
+        snapshot = reference.get()
+
+        try:
+            if not snapshot.exists:
+                result = reference.create(self._lease_data(run_id, shard))
+            else:
+                current = snapshot.to_dict()
+                if current.get("status") == "done":
+                    return "done", None
+                if (
+                    current.get("owner") != self.owner
+                    and current["expires_at"] > datetime.now(timezone.utc)
+                ):
+                    return "held", None
+                result = reference.update(
+                    self._lease_data(run_id, shard),
+                    option=self.db.write_option(last_update_time=snapshot.update_time),
+                )
+        except (exceptions.Conflict, exceptions.FailedPrecondition):
+            return "held", None
+
+        return "claimed", Lease(reference, run_id, shard, self.owner, result.update_time)
+
+    def _write(self, lease, data):
+        try:
+            result = lease.reference.update(
+                data,
+                option=self.db.write_option(last_update_time=lease.update_time),
+            )
+        except (exceptions.FailedPrecondition, exceptions.NotFound) as e:
+            raise LeaseLost(f"Lease {lease.reference.id} was taken over") from e
+        lease.update_time = result.update_time
+
+    def renew(self, lease):
+        self._write(
+            lease,
+            {"expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl)},
+        )
+
+    def complete(self, lease, result=None):
+        self._write(
+            lease,
+            {
+                "status": "done",
+                "result": result,
+                "completed_at": datetime.now(timezone.utc),
+            },
+        )
+
+
+class ShardedSweep:
+    """Runs the auto-cancel sweeps shard by shard under leases.
+
+    Every worker calls ``run`` with the same ``run_id``; each shard is swept
+    by whichever worker leases it. Workers keep polling until every shard is
+    done, so a shard whose owner died is picked up once its lease expires.
+    Sweeps are idempotent (cancelled contracts are skipped), so a shard that
+    is re-run after a crash does not cancel or notify twice.
+
+    The lease is renewed, conditionally, before every batch commit. A worker
+    that stalled past the lease TTL therefore gets ``LeaseLost`` instead of
+    writing, and leaves the shard to its new owner.
+    """
+
+    def __init__(self, service, leases: ShardLeases, shards: int, poll_interval: float = None):
+        self.service = service
+        self.leases = leases
+        self.ranges = shard_ranges(shards)
+        self.poll_interval = (
+            poll_interval
+            if poll_interval is not None
+            else float(os.getenv("AUTO_CANCEL_LEASE_POLL", "5"))
+        )
+
+    def run(self, run_id: str, progress: Progress = None, timeout: float = None):
+        progress = progress if progress is not None else Progress()
+        progress.update(
+            shards=len(self.ranges),
+            shards_swept=0,
+            shards_lost=0,
+            documents_scanned=0,
+            contracts_cancelled=0,
+            events_deleted=0,
+        )
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pending = set(range(len(self.ranges)))
+
+        while pending:
+            for shard in sorted(pending):
+                state, lease = self.leases.claim(run_id, shard)
+                if state == "done":
+                    pending.discard(shard)
+                elif state == "claimed":
+                    try:
+                        self._sweep(lease, progress)
+                    except LeaseLost:
+                        # Another worker took the shard over and finishes it.
+                        logger.warning(
+                            "Shard lease lost", extra={"run_id": run_id, "shard": shard}
+                        )
+                        progress.add(shards_lost=1)
+                    pending.discard(shard)
+
+            if pending:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"Shards {sorted(pending)} still leased by other workers")
+                time.sleep(self.poll_interval)
+
+        return progress.snapshot()
+
+    def _sweep(self, lease, progress):
+        id_range = self.ranges[lease.shard]
+
+        def renew():
+            self.leases.renew(lease)
+
+        contracts = self.service.auto_cancel_contracts(
+            id_range=id_range, progress=progress, before_flush=renew
+        )
+        renew()
+        events = self.service.auto_delete_expired_events(
+            id_range=id_range, progress=progress, before_flush=renew
+        )
+        self.leases.complete(
+            lease,
+            {"contracts_cancelled": contracts["acted"], "events_deleted": events["acted"]},
+        )
+        progress.add(shards_swept=1)
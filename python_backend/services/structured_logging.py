@@ -0,0 +1,46 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+APP_LOGGERS = ("services", "routes")
+
+# Attributes every LogRecord has; anything else came in through ``extra``.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the fields passed through ``extra``."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """Send application logs to stderr as JSON at ``LOG_LEVEL`` (default INFO).
+
+    Only the application's own loggers are raised to that level; library
+    loggers stay at WARNING. Messages below the level are dropped before
+    any formatting happens.
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        root.addHandler(handler)
+        root.setLevel(logging.WARNING)
+
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    for name in APP_LOGGERS:
+        logging.getLogger(name).setLevel(level)
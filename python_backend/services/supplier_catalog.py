@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import os
+import threading
+from typing import List, Optional, Tuple
+
+from models.schemas import Supplier
+
+
+def supplier_from_document(data: dict) -> Optional[Supplier]:
+    """Map a Firestore supplier document onto the ``Supplier`` schema."""
+    name = data.get("name")
+    if not name:
+        return None
+
+    reviews = data.get("reviews") or ""
+    if isinstance(reviews, list):
+        reviews = " ".join(
+            r.get("comment") or r.get("review") or "" if isinstance(r, dict) else str(r)
+            for r in reviews
+        )
+
+    return Supplier(
+        name=name,
+        category=data.get("category") or "",
+        avg_rating=float(data.get("avg_rating") or 0),
+        reviews=reviews,
+    )
+
+
+def filter_suppliers(
+    suppliers: List[Supplier], category: str = None, min_rating: float = None
+) -> List[Supplier]:
+    if category:
+        category = category.lower()
+        suppliers = [s for s in suppliers if s.category.lower() == category]
+    if min_rating is not None:
+        suppliers = [s for s in suppliers if s.avg_rating >= min_rating]
+    return suppliers
+
+
+class SupplierCatalog:
+    """In-memory supplier index kept live by a Firestore snapshot listener.
+
+    The first snapshot loads the whole collection; later ones only carry the
+    documents that changed. ``fingerprint`` is derived from the document ids
+    and update times, so every worker holding the same catalog state agrees
+    on it and shared caches can be keyed on it.
+    """
+
+    def __init__(self, db, collection: str = None):
+        self.db = db
+        self.collection = collection or os.getenv("SUPPLIER_COLLECTION", "suppliers")
+        self.fingerprint = 0
+        self._digests = {}  # doc id -> digest of (id, update time)
+        self.ready = threading.Event()
+        self._suppliers = {}
+        self._lock = threading.Lock()
+        self._watch = None
+
+    def start(self):
+        if self._watch is None:
+            self._watch = self.db.collection(self.collection).on_snapshot(
+                self._on_snapshot
+            )
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _on_snapshot(self, documents, changes, read_time):
+        with self._lock:
+            for change in changes:
+                doc_id = change.document.id
+                supplier = None
+                if change.type.name != "REMOVED":
+                    supplier = supplier_from_document(change.document.to_dict())
+
+                if supplier is None:
+                    self._suppliers.pop(doc_id, None)
+                else:
+                    self._suppliers[doc_id] = supplier
+                self._update_fingerprint(doc_id, supplier, change.document.update_time)
+        self.ready.set()
+
+    def _update_fingerprint(self, doc_id, supplier, update_time):
+        # XOR of per-document digests: order-independent and updated per change.
+        self.fingerprint ^= self._digests.pop(doc_id, 0)
+        if supplier is not None:
+            digest = hashlib.sha256(f"{doc_id}:{update_time}".encode("utf-8")).digest()
+            self._digests[doc_id] = int.from_bytes(digest[:16], "big")
+            self.fingerprint ^= self._digests[doc_id]
+
+    async def wait_ready(self, timeout: float = None):
+        if self.ready.is_set():
+            return
+        timeout = timeout or float(os.getenv("SUPPLIER_CATALOG_TIMEOUT", "10"))
+        if not await asyncio.to_thread(self.ready.wait, timeout):
+            raise RuntimeError("Supplier catalog is still loading")
+
+    def search(
+        self, category: str = None, min_rating: float = None
+    ) -> Tuple[List[Supplier], str]:
+        """Return the matching suppliers and the cache scope they were read under.
+
+        Both come from one locked read, so a snapshot applied in between can
+        never pair an old supplier list with a new fingerprint.
+        """
+        with self._lock:
+            suppliers = list(self._suppliers.values())
+            fingerprint = self.fingerprint
+        scope = f"catalog:{self.collection}:{fingerprint:032x}:{category}:{min_rating}"
+        return filter_suppliers(suppliers, category, min_rating), scope
+
+    def __len__(self):
+        return len(self._suppliers)
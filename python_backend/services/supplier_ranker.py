@@ -0,0 +1,82 @@
+import itertools
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import List
+
+from models.schemas import Supplier
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+@lru_cache(maxsize=int(os.getenv("SUPPLIER_TERM_CACHE_SIZE", "20000")))
+def _term_counts(text: str):
+    """Token counts and length of one supplier's text.
+
+    Memoized on the text, so a catalog is tokenized once per snapshot: only
+    suppliers whose documents changed are tokenized again.
+    """
+    text = text.lower()
+    return Counter(tokenize(text)), len(text.split())
+
+
+def rank_suppliers(
+    user_prompt: str,
+    suppliers: List[Supplier],
+    top_k: int,
+    rating_weight: float = 0.3,
+    k1: float = 1.5,
+    b: float = 0.75,
+) -> List[Supplier]:
+    """Return the ``top_k`` suppliers that best match the prompt.
+
+    Scores are BM25 of the prompt against each supplier's name, category
+    (counted twice) and reviews, normalized to [0, 1] and blended with
+    ``avg_rating / 5``. Ties keep catalog order. CPU-bound for large
+    catalogs; call it off the event loop.
+    """
+    if len(suppliers) <= top_k:
+        return list(suppliers)
+
+    import numpy as np
+
+    query_terms = list(dict.fromkeys(tokenize(user_prompt)))
+    ratings = np.array([s.avg_rating for s in suppliers], dtype=float) / 5.0
+
+    text_score = np.zeros(len(suppliers))
+    if query_terms:
+        indexed = [
+            _term_counts(f"{s.name} {s.category} {s.category} {s.reviews}")
+            for s in suppliers
+        ]
+        doc_len = np.fromiter(
+            (length for _, length in indexed), dtype=float, count=len(indexed)
+        )
+
+        # Term frequencies for query terms only: (suppliers x query terms)
+        tf = np.fromiter(
+            itertools.chain.from_iterable(
+                map(counts.get, query_terms, itertools.repeat(0))
+                for counts, _ in indexed
+            ),
+            dtype=float,
+            count=len(indexed) * len(query_terms),
+        ).reshape(len(indexed), len(query_terms))
+
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log1p((len(indexed) - df + 0.5) / (df + 0.5))
+        avgdl = doc_len.mean() or 1.0
+        norm = k1 * (1 - b + b * doc_len / avgdl)
+        bm25 = (idf * tf * (k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+        if bm25.max() > 0:
+            text_score = bm25 / bm25.max()
+
+    score = (1 - rating_weight) * text_score + rating_weight * ratings
+    top = np.argsort(-score, kind="stable")[:top_k]
+    return [suppliers[i] for i in top]
@@ -0,0 +1,371 @@
+"""Shared resilience policy for calls to external services.
+
+Every upstream (Xendit, Lalamove, Gemini) gets one ``Upstream`` per app
+lifespan. A call through it:
+
+- is bounded by the operation's timeout and by whatever is left of the
+  current request's deadline budget,
+- is retried with jittered exponential backoff on transient failures, but
+  only when the caller marks the operation idempotent,
+- fails fast with ``CircuitOpen`` while the upstream's breaker is open.
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+
+from services.metrics import REGISTRY, track_upstream
+from services.rate_limiter import retry_after_seconds
+
+RETRY_STATUSES = {502, 503, 504}
+TRANSIENT_ERRORS = (
+    asyncio.TimeoutError,
+    httpx.TimeoutException,
+    httpx.TransportError,
+)
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    # requests is only loaded once a service needs it; until then none of
+    # its exceptions can be raised.
+    requests = sys.modules.get("requests")
+    return requests is not None and isinstance(
+        error, (requests.ConnectionError, requests.Timeout)
+    )
+
+
+# Per-upstream defaults; any value can be overridden from the environment
+# (see ``Upstream.from_env``).
+UPSTREAM_DEFAULTS = {
+    "xendit": {
+        "timeout": 10,
+        "timeouts": {"invoice.create": 30, "payout.create": 30, "refund.create": 30},
+    },
+    "lalamove": {"timeout": 10, "timeouts": {"orders.create": 30}},
+    "gemini": {"timeout": 30, "timeouts": {"stream": 60}},
+}
+
+UPSTREAM_RETRIES = REGISTRY.counter(
+    "upstream_retries_total",
+    "Calls to external services that were retried.",
+    ("upstream", "operation"),
+)
+UPSTREAM_CIRCUIT_OPEN = REGISTRY.gauge(
+    "upstream_circuit_open",
+    "1 while the upstream's circuit breaker is rejecting calls.",
+    ("upstream",),
+)
+
+_deadline = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+class UpstreamUnavailable(Exception):
+    """The upstream was not called, or not waited for, to protect the caller."""
+
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    pass
+
+
+@contextmanager
+def deadline_scope(seconds: float, replace: bool = False):
+    """Give the calls made inside this block ``seconds`` in total to finish.
+
+    A nested scope can only shorten an enclosing deadline unless ``replace``
+    is set, which long-running streams use to give each item its own budget.
+    """
+    deadline = time.monotonic() + seconds
+    current = None if replace else _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget():
+    """Seconds left in the current deadline, or ``None`` without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def bounded_timeout(timeout: float) -> float:
+    """Shrink ``timeout`` to the remaining deadline budget, failing if none is left."""
+    remaining = remaining_budget()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(timeout, remaining)
+
+
+class DeadlineMiddleware:
+    """ASGI middleware giving each HTTP request a ``REQUEST_DEADLINE`` budget."""
+
+    def __init__(self, app, seconds: float = None):
+        self.app = app
+        self.seconds = seconds or float(os.getenv("REQUEST_DEADLINE", "30"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with deadline_scope(self.seconds):
+            await self.app(scope, receive, send)
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open every call is rejected. After ``reset_timeout`` seconds a
+    single trial call is let through: success closes the breaker, failure
+    opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def release(self):
+        """End a trial call without a verdict (e.g. it was cancelled)."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True when it (re)opens the breaker."""
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                return True
+            return False
+
+
+def _status_code(outcome):
+    """HTTP status of a response or an SDK error, if it carries one."""
+    for attr in ("status_code", "code"):
+        value = getattr(outcome, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def error_body(response: httpx.Response):
+    """The JSON error body of a response, or its text when it is not JSON.
+
+    Outages often answer with HTML or plain-text 5xx pages.
+    """
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+def _env(name: str, key: str, default):
+    value = os.getenv(f"UPSTREAM_{name}_{key}".upper().replace(".", "_"))
+    return type(default)(value) if value is not None else default
+
+
+class Upstream:
+    """Timeout, retry and circuit-breaker policy for one external service."""
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float = 10,
+        timeouts: dict = None,
+        retries: int = 2,
+        backoff: float = 0.2,
+        max_backoff: float = 2.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+    @classmethod
+    def from_env(cls, name: str) -> "Upstream":
+        """Build from ``UPSTREAM_DEFAULTS`` and ``UPSTREAM_<NAME>_*`` variables.
+
+        e.g. ``UPSTREAM_XENDIT_TIMEOUT``, ``UPSTREAM_XENDIT_PAYOUT_CREATE_TIMEOUT``,
+        ``UPSTREAM_GEMINI_RETRIES``, ``UPSTREAM_LALAMOVE_BREAKER_THRESHOLD``.
+        """
+        defaults = UPSTREAM_DEFAULTS.get(name, {})
+        timeouts = {
+            operation: _env(name, f"{operation}_timeout", float(timeout))
+            for operation, timeout in defaults.get("timeouts", {}).items()
+        }
+        return cls(
+            name,
+            timeout=_env(name, "timeout", float(defaults.get("timeout", 10))),
+            timeouts=timeouts,
+            retries=_env(name, "retries", 2),
+            backoff=_env(name, "backoff", 0.2),
+            failure_threshold=_env(name, "breaker_threshold", 5),
+            reset_timeout=_env(name, "breaker_reset", 30.0),
+        )
+
+    def timeout_for(self, operation: str) -> float:
+        return self.timeouts.get(operation, self.timeout)
+
+    def _admit(self, operation: str) -> float:
+        timeout = bounded_timeout(self.timeout_for(operation))
+        if not self.breaker.allow():
+            raise CircuitOpen(f"{self.name} is unavailable, try again later")
+        return timeout
+
+    def _outcome(self, result=None, error: BaseException = None) -> bool:
+        """Update the breaker; returns True if the attempt may be retried.
+
+        2xx/3xx responses and 4xx answers (the caller's mistake, e.g. a
+        XenditError for a bad request) count as successes. 5xx answers,
+        transport errors and unexpected exceptions count as failures.
+        """
+        if isinstance(error, DeadlineExceeded):
+            # The caller ran out of budget; says nothing about the upstream.
+            self.breaker.release()
+            return False
+        status = _status_code(error if error is not None else result)
+        if error is not None:
+            transient = _is_transient(error) or status in RETRY_STATUSES
+            failed = status is None or status >= 500
+        else:
+            transient = status in RETRY_STATUSES
+            failed = status is not None and status >= 500
+
+        if failed or transient:
+            if self.breaker.record_failure():
+                UPSTREAM_CIRCUIT_OPEN.set(1, upstream=self.name)
+        else:
+            self.breaker.record_success()
+            UPSTREAM_CIRCUIT_OPEN.set(0, upstream=self.name)
+        return transient
+
+    def _retry_delay(self, attempt: int, result=None):
+        """Backoff before the next attempt, or ``None`` if the budget can't cover it."""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        headers = getattr(result, "headers", None)
+        if headers is not None and headers.get("Retry-After"):
+            delay = retry_after_seconds(headers["Retry-After"], delay)
+
+        remaining = remaining_budget()
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
+
+    async def call(self, operation: str, fn, idempotent: bool = False):
+        """Await ``fn()`` under this policy; HTTP responses are returned as-is.
+
+        Responses with a retryable status are only retried for idempotent
+        operations; the last response is returned when retries run out.
+        """
+        attempts = self.retries + 1 if idempotent else 1
+        for attempt in range(attempts):
+            timeout = self._admit(operation)
+            result = error = None
+            try:
+                async with track_upstream(self.name, operation) as tracked:
+                    result = await asyncio.wait_for(fn(), timeout)
+                    tracked.status = getattr(result, "status_code", "ok")
+            except asyncio.TimeoutError as e:
+                error = e
+                if timeout < self.timeout_for(operation):
+                    error = DeadlineExceeded("Request deadline exceeded")
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                error = e
+
+            retryable = self._outcome(result, error)
+            delay = None
+            if retryable and attempt + 1 < attempts:
+                delay = self._retry_delay(attempt, result)
+            if delay is None:
+                if isinstance(error, asyncio.TimeoutError):
+                    raise UpstreamUnavailable(
+                        f"{self.name} {operation} timed out after {timeout:.1f}s"
+                    ) from error
+                if error is not None:
+                    raise error
+                return result
+
+            UPSTREAM_RETRIES.inc(upstream=self.name, operation=operation)
+            await asyncio.sleep(delay)
+
+    def call_sync(self, operation: str, fn, idempotent: bool = False):
+        """Blocking variant of ``call`` for SDKs built on ``requests``.
+
+        The call itself cannot be interrupted, so its timeout must come from
+        the HTTP session (see ``http_session.build_http_session``).
+        """
+        attempts = self.retries + 1 if idempotent else 1
+        for attempt in range(attempts):
+            self._admit(operation)
+            result = error = None
+            try:
+                with track_upstream(self.name, operation) as tracked:
+                    result = fn()
+                    tracked.status = getattr(result, "status_code", "ok")
+            except Exception as e:
+                error = e
+
+            retryable = self._outcome(result, error)
+            delay = None
+            if retryable and attempt + 1 < attempts:
+                delay = self._retry_delay(attempt, result)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return result
+
+            UPSTREAM_RETRIES.inc(upstream=self.name, operation=operation)
+            time.sleep(delay)
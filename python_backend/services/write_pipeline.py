@@ -0,0 +1,133 @@
+import os
+import time
+
+from google.api_core import exceptions
+
+from services.metrics import track_upstream
+
+# Firestore rejects batches with more than 500 writes.
+MAX_BATCH_WRITES = 500
+
+TRANSIENT_ERRORS = (
+    exceptions.Aborted,
+    exceptions.DeadlineExceeded,
+    exceptions.InternalServerError,
+    exceptions.ResourceExhausted,
+    exceptions.ServiceUnavailable,
+)
+
+
+class WritePipeline:
+    """Buffers Firestore mutations and commits them as batched writes.
+
+    Mutations are added in groups (e.g. a contract update plus its
+    notifications). A group is never split across batches, so it is applied
+    entirely or not at all. Transient commit errors are retried with backoff;
+    if they persist, every group of the batch is marked failed. A batch
+    rejected for another reason is committed group by group, so a single bad
+    group only fails itself.
+
+    ``before_flush()`` runs before every commit, including each per-group
+    fallback commit, and may raise to abort the write (e.g. when a lease is
+    lost). ``on_commit(groups)`` is
+    called after every successful commit with the number of groups applied.
+    """
+
+    def __init__(
+        self,
+        db,
+        flush_size: int = None,
+        max_retries: int = None,
+        backoff: float = 0.5,
+        before_flush=None,
+        on_commit=None,
+    ):
+        self.db = db
+        self.before_flush = before_flush
+        self.on_commit = on_commit
+        self.flush_size = min(
+            flush_size or int(os.getenv("FIRESTORE_BATCH_SIZE", str(MAX_BATCH_WRITES))),
+            MAX_BATCH_WRITES,
+        )
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else int(os.getenv("FIRESTORE_WRITE_RETRIES", "3"))
+        )
+        self.backoff = backoff
+        self.commits = 0
+        self.writes = 0
+        self.groups = 0
+        self.failed = []
+        self._groups = []
+        self._pending = 0
+
+    def add(self, writes: list, label=None):
+        """Queue one group of ``(op, reference, data)`` writes.
+
+        ``op`` is ``"set"``, ``"update"`` or ``"delete"``; ``label`` identifies
+        the group in ``self.failed``.
+        """
+        if len(writes) > self.flush_size:
+            raise ValueError("A write group cannot exceed the flush size")
+        if self._pending + len(writes) > self.flush_size:
+            self.flush()
+        self._groups.append((label, writes))
+        self._pending += len(writes)
+        self.groups += 1
+
+    def flush(self):
+        groups, self._groups, self._pending = self._groups, [], 0
+        if not groups:
+            return
+        if self.before_flush is not None:
+            self.before_flush()
+        try:
+            self._commit(groups)
+        except TRANSIENT_ERRORS:
+            # Retries are exhausted; committing group by group would only
+            # repeat the backoff for every group during the outage.
+            self.failed.extend(label for label, _ in groups)
+        except exceptions.GoogleAPICallError:
+            if len(groups) == 1:
+                self.failed.append(groups[0][0])
+                return
+            for group in groups:
+                if self.before_flush is not None:
+                    self.before_flush()
+                try:
+                    self._commit([group])
+                except exceptions.GoogleAPICallError:
+                    self.failed.append(group[0])
+
+    def _commit(self, groups):
+        for attempt in range(self.max_retries + 1):
+            batch = self.db.batch()
+            count = 0
+            for _, writes in groups:
+                for op, reference, data in writes:
+                    if op == "delete":
+                        batch.delete(reference)
+                    else:
+                        getattr(batch, op)(reference, data)
+                    count += 1
+            try:
+                with track_upstream("firestore", "commit"):
+                    batch.commit()
+            except TRANSIENT_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff * 2**attempt)
+                continue
+            self.commits += 1
+            self.writes += count
+            if self.on_commit is not None:
+                self.on_commit(len(groups))
+            return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()